@@ -1,10 +1,10 @@
 """
 FastAPI main application for Face Recognition Server
 """
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, status
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Depends, Header, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi.responses import JSONResponse, FileResponse
 from typing import List, Optional
 import logging
 import os
@@ -12,13 +12,17 @@ import uuid
 from pathlib import Path
 
 from config import settings
-from database.connection import get_db, init_database
+from database.connection import init_database, async_engine, AsyncSessionLocal
+from database.log_sink import LogSink, recognition_log_records
 from services.integrated_face_service import IntegratedFaceService
+from services.pipeline_plan import PipelinePlan
+from utils.metrics import QUEUE_DEPTH, REQUESTS_TOTAL, CONTENT_TYPE_LATEST, render_metrics
 from api.schemas import (
     FaceRecognitionRequest,
     FaceRecognitionResponse,
     AddFaceRequest,
     AddFaceResponse,
+    VerifyIdentityResponse,
     ServiceStatsResponse,
     HealthCheckResponse
 )
@@ -48,23 +52,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    """Count requests per route template and status code"""
+    # A handler that raises never produces a response; count it as a 500
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        REQUESTS_TOTAL.labels(method=request.method, path=path, status=status_code).inc()
+
 # Initialize services
 integrated_service = IntegratedFaceService()
 
 # Initialize database
 init_database()
 
+# Request logs are written in the background, off the request path
+log_sink = LogSink(
+    AsyncSessionLocal,
+    max_queue=settings.LOG_SINK_MAX_QUEUE,
+    batch_size=settings.LOG_SINK_BATCH_SIZE,
+    flush_interval=settings.LOG_SINK_FLUSH_INTERVAL,
+    drop_policy=settings.LOG_SINK_DROP_POLICY
+)
+
 @app.on_event("startup")
 async def startup_event():
     """Application startup event"""
     logger.info("Face Recognition API starting up...")
     logger.info(f"API Version: {settings.VERSION}")
     logger.info(f"Debug Mode: {settings.DEBUG}")
+    if settings.LOG_SINK_ENABLED:
+        await log_sink.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event"""
     logger.info("Face Recognition API shutting down...")
+    await log_sink.stop()
+    await async_engine.dispose()
 
 @app.get("/", response_model=HealthCheckResponse)
 async def root():
@@ -96,13 +127,27 @@ async def health_check():
             status="unhealthy"
         )
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/api/v1/recognize", response_model=FaceRecognitionResponse)
 async def recognize_faces(
+    request: Request,
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    plan: PipelinePlan = PipelinePlan.FULL,
+    enable_anti_spoof: Optional[bool] = None,
+    enable_gender_detection: Optional[bool] = None,
+    include_timings: bool = False
 ):
     """
     Recognize faces in uploaded image
+    
+    ``plan`` selects how much of the pipeline runs: ``detect`` (bounding
+    boxes only), ``embed`` (+ recognition) or ``full`` (+ gender and
+    anti-spoofing, each of which can also be switched off per request).
+    Pass ``include_timings=true`` to get a per-stage latency breakdown.
     """
     try:
         # Validate file
@@ -128,8 +173,14 @@ async def recognize_faces(
             content = await file.read()
             buffer.write(content)
         
-        # Process image
-        results = integrated_service.process_image_comprehensive(str(upload_path))
+        # Process image in a worker thread so the event loop keeps accepting
+        # requests and the gauge sees every request in flight
+        with QUEUE_DEPTH.track_inprogress():
+            results = await run_in_threadpool(
+                integrated_service.process_image_comprehensive,
+                str(upload_path),
+                stages=integrated_service.resolve_stages(plan, enable_anti_spoof, enable_gender_detection)
+            )
         
         # Clean up uploaded file
         try:
@@ -137,6 +188,14 @@ async def recognize_faces(
         except:
             pass
         
+        if settings.LOG_SINK_ENABLED:
+            for model, record in recognition_log_records(
+                results,
+                ip_address=request.client.host if request.client else None,
+                user_agent=request.headers.get('user-agent')
+            ):
+                log_sink.enqueue(model, record)
+        
         return FaceRecognitionResponse(
             success=results['success'],
             image_path=results['image_path'],
@@ -144,6 +203,11 @@ async def recognize_faces(
             faces_analyzed=results['faces_analyzed'],
             overall_risk_score=results['overall_risk_score'],
             processing_time=results['processing_time'],
+            stage_timings=results.get('stage_timings') if include_timings else None,
+            plan=results.get('plan', plan),
+            skipped_stages=results.get('skipped_stages', []),
+            estimated_savings=results.get('estimated_savings', {}),
+            cache_hit=results.get('cache_hit', False),
             error=results.get('error')
         )
         
@@ -156,11 +220,89 @@ async def recognize_faces(
             detail=f"Internal server error: {str(e)}"
         )
 
+@app.post("/api/v1/verify", response_model=VerifyIdentityResponse)
+async def verify_identity(
+    file: UploadFile = File(...),
+    user_id: str = Form(..., min_length=1),
+    check_anti_spoof: bool = False,
+    check_gender: bool = False,
+    include_timings: bool = False
+):
+    """
+    Verify an uploaded face against one claimed user (1:1)
+    
+    Compares against the claimed user's enrolled embeddings only, without
+    YOLO or a gallery scan. Anti-spoofing and gender detection are opt-in.
+    """
+    try:
+        # Validate file
+        if not file.content_type.startswith('image/'):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File must be an image"
+            )
+        
+        # Check file size
+        if file.size > settings.MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"File size exceeds {settings.MAX_FILE_SIZE} bytes"
+            )
+        
+        # Save uploaded file
+        file_id = str(uuid.uuid4())
+        file_extension = Path(file.filename).suffix
+        upload_path = Path(settings.UPLOAD_DIR) / f"{file_id}{file_extension}"
+        
+        with open(upload_path, "wb") as buffer:
+            content = await file.read()
+            buffer.write(content)
+        
+        # Verify identity
+        with QUEUE_DEPTH.track_inprogress():
+            result = await run_in_threadpool(
+                integrated_service.verify_identity,
+                str(upload_path),
+                user_id,
+                check_anti_spoof=check_anti_spoof,
+                check_gender=check_gender
+            )
+        
+        # Clean up uploaded file
+        try:
+            os.remove(upload_path)
+        except:
+            pass
+        
+        return VerifyIdentityResponse(
+            success=result['success'],
+            user_id=result['user_id'],
+            verified=result['verified'],
+            enrolled=result['enrolled'],
+            distance=result['distance'],
+            confidence=result['confidence'],
+            bbox=result['bbox'],
+            faces_detected=result['faces_detected'],
+            anti_spoof=result['anti_spoof'],
+            gender_detection=result['gender_detection'],
+            processing_time=result['processing_time'],
+            stage_timings=result['stage_timings'] if include_timings else None,
+            error=result.get('error')
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error verifying identity: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Internal server error: {str(e)}"
+        )
+
 @app.post("/api/v1/add-face", response_model=AddFaceResponse)
 async def add_face(
     request: AddFaceRequest,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    file: UploadFile = File(...)
 ):
     """
     Add a new face to the database
@@ -190,10 +332,12 @@ async def add_face(
             buffer.write(content)
         
         # Add face to database
-        result = integrated_service.add_face_to_database(
-            user_id=request.user_id,
-            image_path=str(upload_path)
-        )
+        with QUEUE_DEPTH.track_inprogress():
+            result = await run_in_threadpool(
+                integrated_service.add_face_to_database,
+                user_id=request.user_id,
+                image_path=str(upload_path)
+            )
         
         # Clean up uploaded file
         try:
@@ -225,6 +369,7 @@ async def get_service_stats():
     """
     try:
         stats = integrated_service.get_service_statistics()
+        stats['log_sink'] = log_sink.stats()
         return ServiceStatsResponse(
             success=True,
             statistics=stats
@@ -237,7 +382,7 @@ async def get_service_stats():
         )
 
 @app.get("/api/v1/faces")
-async def get_known_faces(db: Session = Depends(get_db)):
+async def get_known_faces():
     """
     Get list of known faces
     """
@@ -260,7 +405,7 @@ async def get_known_faces(db: Session = Depends(get_db)):
         )
 
 @app.delete("/api/v1/faces/{user_id}")
-async def delete_face(user_id: str, db: Session = Depends(get_db)):
+async def delete_face(user_id: str):
     """
     Delete a face from the database
     """
@@ -279,6 +424,70 @@ async def delete_face(user_id: str, db: Session = Depends(get_db)):
             detail=f"Internal server error: {str(e)}"
         )
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency guarding admin endpoints
+    """
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled"
+        )
+    if x_admin_token != settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
+
+@app.post("/api/v1/admin/profile", dependencies=[Depends(require_admin)])
+async def start_profiling(requests: int = 10, mode: str = "cprofile"):
+    """
+    Profile the next N pipeline requests (mode: cprofile or torch)
+    """
+    try:
+        return {
+            "success": True,
+            "profiler": integrated_service.profiler.arm(requests, mode)
+        }
+    except (ValueError, ImportError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+@app.get("/api/v1/admin/profile", dependencies=[Depends(require_admin)])
+async def get_profiling_status():
+    """
+    Get profiler status
+    """
+    return {
+        "success": True,
+        "profiler": integrated_service.profiler.status()
+    }
+
+@app.delete("/api/v1/admin/profile", dependencies=[Depends(require_admin)])
+async def stop_profiling():
+    """
+    Stop profiling and write what has been captured so far
+    """
+    return {
+        "success": True,
+        "profiler": integrated_service.profiler.disarm()
+    }
+
+@app.get("/api/v1/admin/profile/download", dependencies=[Depends(require_admin)])
+async def download_profile():
+    """
+    Download the latest profile (.pstats or zip of Chrome traces)
+    """
+    artifact = integrated_service.profiler.last_artifact
+    if artifact is None or not artifact.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No profile available"
+        )
+    return FileResponse(str(artifact), filename=artifact.name)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
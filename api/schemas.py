@@ -5,6 +5,8 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
+from services.pipeline_plan import PipelinePlan
+
 class FaceAnalysis(BaseModel):
     """Face analysis result"""
     face_id: int
@@ -39,6 +41,27 @@ class FaceRecognitionResponse(BaseModel):
     faces_analyzed: List[FaceAnalysis] = Field(..., description="Detailed face analysis results")
     overall_risk_score: float = Field(..., ge=0, le=1, description="Overall risk score")
     processing_time: float = Field(..., ge=0, description="Processing time in seconds")
+    stage_timings: Optional[Dict[str, float]] = Field(None, description="Per-stage and per-model latency in seconds")
+    plan: PipelinePlan = Field(PipelinePlan.FULL, description="Pipeline plan that was run")
+    skipped_stages: List[str] = Field(default_factory=list, description="Model stages skipped by the plan")
+    estimated_savings: Dict[str, float] = Field(default_factory=dict, description="Estimated seconds saved per skipped stage")
+    cache_hit: bool = Field(False, description="Result served from the result cache")
+    error: Optional[str] = Field(None, description="Error message if any")
+
+class VerifyIdentityResponse(BaseModel):
+    """Response model for 1:1 identity verification"""
+    success: bool = Field(..., description="Request success status")
+    user_id: str = Field(..., description="Claimed user ID")
+    verified: bool = Field(..., description="Face matches the claimed user")
+    enrolled: bool = Field(..., description="Claimed user has enrolled faces")
+    distance: Optional[float] = Field(None, ge=0, description="Embedding distance to the closest enrolled face")
+    confidence: float = Field(..., ge=0, le=1, description="Verification confidence")
+    bbox: Optional[List[float]] = Field(None, description="Bounding box of the verified face")
+    faces_detected: int = Field(..., ge=0, description="Number of faces detected")
+    anti_spoof: Optional[Dict[str, Any]] = Field(None, description="Anti-spoofing results, if requested")
+    gender_detection: Optional[Dict[str, Any]] = Field(None, description="Gender detection results, if requested")
+    processing_time: float = Field(..., ge=0, description="Processing time in seconds")
+    stage_timings: Optional[Dict[str, float]] = Field(None, description="Per-stage and per-model latency in seconds")
     error: Optional[str] = Field(None, description="Error message if any")
 
 class AddFaceRequest(BaseModel):
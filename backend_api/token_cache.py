@@ -0,0 +1,162 @@
+"""
+Short-TTL cache of per-user token balances
+
+Balances are cached for ``ttl`` seconds, which bounds how stale a read can
+be when another process changes a balance. Writes made through this API
+(send_content) update the cached entry in place, so a user never sees their
+own send lag behind. With REDIS_URL set the cache lives in Redis and is
+shared by every API replica; otherwise it is an in-process LRU.
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+class TokenCache:
+    """
+    Per-user token balance cache
+
+    Args:
+        ttl: Seconds a cached balance may be served (0 disables the cache)
+        max_entries: In-process entries kept before evicting the least recently used
+        redis_url: Optional Redis URL for a cache shared between replicas
+    """
+
+    def __init__(self, ttl: float = 5.0, max_entries: int = 10000, redis_url: Optional[str] = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis = None
+        if redis_url:
+            if redis is None:
+                logger.warning("REDIS_URL is set but the redis package is not installed; using an in-process cache")
+            else:
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    @property
+    def backend(self) -> str:
+        return "redis" if self._redis is not None else "memory"
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Cached balance row for ``user_id``, or None on a miss"""
+        if self.ttl <= 0:
+            return None
+        tokens = await self._get(user_id)
+        if tokens is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return tokens
+
+    async def set(self, user_id: str, tokens: Dict[str, Any]):
+        """Cache a balance row just read from the database"""
+        if self.ttl > 0:
+            await self._set(user_id, tokens)
+
+    async def update(self, user_id: str, **fields):
+        """
+        Write-through: apply fields the database just returned to a cached entry
+
+        The entry keeps its original expiry, so fields that were not written
+        are still never served more than ``ttl`` seconds after they were
+        read. Entries that are not cached are left alone; the next read
+        fetches them.
+        """
+        if self.ttl <= 0:
+            return
+        tokens = await self._get(user_id)
+        if tokens is not None:
+            tokens.update(fields)
+            await self._set(user_id, tokens, keep_expiry=True)
+            self.writes += 1
+
+    async def invalidate(self, user_id: str):
+        """Drop a cached balance, e.g. after a write whose result is not known"""
+        self._entries.pop(user_id, None)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._key(user_id))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Token cache invalidate failed: {e}")
+        self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'backend': self.backend,
+            'ttl': self.ttl,
+            'entries': len(self._entries) if self._redis is None else None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'writes': self.writes,
+            'invalidations': self.invalidations,
+            'errors': self.errors
+        }
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+    @staticmethod
+    def _key(user_id: str) -> str:
+        return f"user_tokens:{user_id}"
+
+    async def _get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        if self._redis is not None:
+            try:
+                value = await self._redis.get(self._key(user_id))
+            except Exception as e:
+                # Treat an unreachable cache as a miss rather than failing the request
+                self.errors += 1
+                logger.error(f"Token cache read failed: {e}")
+                return None
+            return json.loads(value) if value is not None else None
+
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        expires_at, tokens = entry
+        if expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return dict(tokens)
+
+    async def _set(self, user_id: str, tokens: Dict[str, Any], keep_expiry: bool = False):
+        if self._redis is not None:
+            try:
+                if keep_expiry:
+                    # xx: never resurrect an entry that expired in the meantime
+                    await self._redis.set(self._key(user_id), json.dumps(tokens), keepttl=True, xx=True)
+                else:
+                    await self._redis.set(self._key(user_id), json.dumps(tokens), px=max(1, int(self.ttl * 1000)))
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Token cache write failed: {e}")
+            return
+
+        expires_at = time.monotonic() + self.ttl
+        if keep_expiry:
+            if user_id not in self._entries:
+                return
+            expires_at = self._entries[user_id][0]
+        self._entries[user_id] = (expires_at, dict(tokens))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
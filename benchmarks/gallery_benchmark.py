@@ -0,0 +1,245 @@
+"""
+Gallery search microbenchmark
+
+Builds galleries of random unit-norm 512-d embeddings and compares search
+backends on enrollment throughput, single-query latency, memory footprint
+and recall@1/@10 against exact brute-force search.
+
+Backends:
+    loop         dict of user_id -> embedding scanned in Python, as in
+                 FaceRecognitionService.recognize_face
+    matrix       one contiguous float32 matrix, vectorised distances
+    faiss_flat   exact faiss IndexFlatL2 (only if faiss is installed)
+    faiss_hnsw   approximate faiss IndexHNSWFlat (only if faiss is installed)
+
+Usage:
+    python -m benchmarks.gallery_benchmark --sizes 1000,100000,1000000
+"""
+import argparse
+import gc
+import heapq
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.synthetic import parse_ints
+
+logger = logging.getLogger(__name__)
+
+DIM = 512
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+class LoopBackend:
+    """Per-user dict scanned with np.linalg.norm, one user at a time"""
+    name = "loop"
+
+    def __init__(self):
+        self.known_embeddings: Dict[str, np.ndarray] = {}
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        for user_id, embedding in zip(ids, embeddings):
+            self.known_embeddings[user_id] = embedding.copy()
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        distances = [(np.linalg.norm(query - known), user_id)
+                     for user_id, known in self.known_embeddings.items()]
+        return [user_id for _, user_id in heapq.nsmallest(k, distances)]
+
+    def memory_bytes(self) -> Optional[int]:
+        return None
+
+class MatrixBackend:
+    """Contiguous float32 matrix with vectorised L2 distances"""
+    name = "matrix"
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.chunks: List[np.ndarray] = []
+        self.matrix = np.empty((0, DIM), dtype=np.float32)
+        self.norms = np.empty(0, dtype=np.float32)
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        self.ids.extend(ids)
+        self.chunks.append(np.asarray(embeddings, dtype=np.float32))
+
+    def finalize(self):
+        if self.chunks:
+            self.matrix = np.concatenate([self.matrix] + self.chunks)
+            self.norms = np.einsum('ij,ij->i', self.matrix, self.matrix)
+            self.chunks = []
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2; the last term is constant
+        distances = self.norms - 2 * (self.matrix @ query)
+        k = min(k, len(distances))
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top])]
+        return [self.ids[i] for i in top]
+
+    def memory_bytes(self) -> Optional[int]:
+        return None
+
+class FaissBackend:
+    """faiss index; flat (exact) or HNSW (approximate)"""
+
+    def __init__(self, kind: str):
+        self.name = f"faiss_{kind}"
+        self.index = faiss.IndexFlatL2(DIM) if kind == "flat" else faiss.IndexHNSWFlat(DIM, 32)
+        if kind == "hnsw":
+            self.index.hnsw.efSearch = 64
+        self.ids: List[str] = []
+
+    def add(self, ids: List[str], embeddings: np.ndarray):
+        self.ids.extend(ids)
+        self.index.add(np.ascontiguousarray(embeddings, dtype=np.float32))
+
+    def search(self, query: np.ndarray, k: int) -> List[str]:
+        _, indices = self.index.search(query.reshape(1, -1).astype(np.float32), k)
+        return [self.ids[i] for i in indices[0] if i >= 0]
+
+    def memory_bytes(self) -> Optional[int]:
+        # Native allocations are invisible to tracemalloc
+        return len(faiss.serialize_index(self.index))
+
+def random_unit_vectors(count: int, rng: np.random.Generator, chunk: int = 65536) -> np.ndarray:
+    """Random unit-norm float32 vectors, generated in chunks to bound peak memory"""
+    out = np.empty((count, DIM), dtype=np.float32)
+    for start in range(0, count, chunk):
+        block = rng.standard_normal((min(chunk, count - start), DIM), dtype=np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        out[start:start + len(block)] = block
+    return out
+
+def make_backends(names: List[str]):
+    backends = []
+    for name in names:
+        if name == "loop":
+            backends.append(LoopBackend())
+        elif name == "matrix":
+            backends.append(MatrixBackend())
+        elif name.startswith("faiss_"):
+            if faiss is None:
+                logger.warning(f"faiss is not installed, skipping {name}")
+                continue
+            backends.append(FaissBackend(name.split("_", 1)[1]))
+        else:
+            raise ValueError(f"Unknown backend: {name}")
+    return backends
+
+def exact_top_k(gallery: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Ground-truth top-k row indices by brute force"""
+    norms = np.einsum('ij,ij->i', gallery, gallery)
+    truth = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        distances = norms - 2 * (gallery @ query)
+        top = np.argpartition(distances, k - 1)[:k]
+        truth[i] = top[np.argsort(distances[top])]
+    return truth
+
+def benchmark_backend(backend, ids: List[str], gallery: np.ndarray, queries: np.ndarray,
+                      truth: np.ndarray, num_queries: int, enroll_batch: int) -> Dict[str, float]:
+    """Enroll the gallery into ``backend`` and measure it"""
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for start in range(0, len(ids), enroll_batch):
+        backend.add(ids[start:start + enroll_batch], gallery[start:start + enroll_batch])
+    if hasattr(backend, "finalize"):
+        backend.finalize()
+    enroll_seconds = time.perf_counter() - t0
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    memory = backend.memory_bytes()
+    if memory is None:
+        memory = traced
+
+    latencies = []
+    hits_at_1 = 0.0
+    hits_at_10 = 0.0
+    k = truth.shape[1]
+    for query, expected in zip(queries[:num_queries], truth[:num_queries]):
+        t0 = time.perf_counter()
+        result = backend.search(query, k)
+        latencies.append(time.perf_counter() - t0)
+        expected_ids = [ids[i] for i in expected]
+        hits_at_1 += float(bool(result) and result[0] == expected_ids[0])
+        hits_at_10 += len(set(result[:k]) & set(expected_ids)) / k
+
+    ordered = sorted(latencies)
+    return {
+        'enroll_per_sec': len(ids) / enroll_seconds if enroll_seconds > 0 else float('inf'),
+        'query_p50_ms': ordered[len(ordered) // 2] * 1000,
+        'query_p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'query_mean_ms': statistics.mean(latencies) * 1000,
+        'memory_mb': memory / (1024 * 1024),
+        'recall_at_1': hits_at_1 / len(latencies),
+        'recall_at_10': hits_at_10 / len(latencies),
+        'queries': len(latencies)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare gallery search backends")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--backends", default="loop,matrix,faiss_flat,faiss_hnsw")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--loop-queries", type=int, default=5,
+                        help="Query cap for the Python loop backend on galleries over 10k")
+    parser.add_argument("--noise", type=float, default=0.05, help="Query perturbation stddev")
+    parser.add_argument("--enroll-batch", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Optional JSON output file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    rng = np.random.default_rng(args.seed)
+    rows = []
+
+    for size in parse_ints(args.sizes):
+        logger.info(f"Building gallery of {size} embeddings")
+        gallery = random_unit_vectors(size, rng)
+        ids = [f"user_{i}" for i in range(size)]
+
+        # Queries are noisy copies of enrolled faces
+        picks = rng.integers(0, size, args.queries)
+        queries = gallery[picks] + rng.standard_normal((args.queries, DIM), dtype=np.float32) * args.noise
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+        truth = exact_top_k(gallery, queries, min(10, size))
+
+        for backend in make_backends(args.backends.split(",")):
+            num_queries = args.queries
+            if backend.name == "loop" and size > 10000:
+                num_queries = min(num_queries, args.loop_queries)
+            logger.info(f"  {backend.name}: enrolling and running {num_queries} queries")
+            row = {'size': size, 'backend': backend.name,
+                   **benchmark_backend(backend, ids, gallery, queries, truth, num_queries, args.enroll_batch)}
+            rows.append(row)
+            del backend
+            gc.collect()
+
+        del gallery, queries
+
+    header = (f"{'size':>9} {'backend':<11} {'enroll/s':>12} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'mem MB':>9} {'R@1':>6} {'R@10':>6} {'queries':>7}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['size']:>9} {row['backend']:<11} {row['enroll_per_sec']:>12.0f} {row['query_p50_ms']:>9.3f} "
+              f"{row['query_p95_ms']:>9.3f} {row['memory_mb']:>9.1f} {row['recall_at_1']:>6.3f} "
+              f"{row['recall_at_10']:>6.3f} {row['queries']:>7}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Haar detection cost and parity: fixed vs adaptive parameters vs shared pyramid
+
+Runs the AdvancedFaceService detection recipe on synthetic images three ways:
+
+- legacy: scaleFactor=1.05, minNeighbors=3, minSize=30 for faces, and the
+  eye cascade at default parameters over each whole face crop
+- adaptive: ``face_detection_params`` sized to the image, and eyes searched
+  only in the upper part of the face within face-relative size bounds
+  (``eye_search_bounds``)
+- pyramid: the adaptive parameters run on one ``HaarPyramid`` shared by
+  the face and eye cascades
+
+All run on the image ``decode_for_detection`` returns. Reported recall is
+against the synthetic ground truth (IoU >= 0.3); parity is the fraction of
+legacy detections each run also finds, and speedup is relative to legacy.
+
+Usage:
+    python -m benchmarks.haar_benchmark
+    python -m benchmarks.haar_benchmark --resolutions 1920x1080 --images 20 --output haar.json
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import generate_image, parse_resolutions
+
+# Haar helpers live with the Railway app
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "face_recognition_server"))
+
+from utils.cascades import face_detection_params, get_cascade  # noqa: E402
+from utils.haar_pyramid import HaarPyramid, eye_search_bounds  # noqa: E402
+from utils.image_decode import decode_for_detection  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+MODES = ("legacy", "adaptive", "pyramid")
+
+LEGACY_FACE_PARAMS = {'scaleFactor': 1.05, 'minNeighbors': 3, 'minSize': (30, 30)}
+
+def iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+def matched(boxes: List[Sequence[float]], targets: List[Sequence[float]], threshold: float = 0.3) -> int:
+    """Number of ``targets`` overlapped by at least one of ``boxes``"""
+    return sum(any(iou(box, target) >= threshold for box in boxes) for target in targets)
+
+def detect(gray: np.ndarray, scale: float, mode: str) -> Dict:
+    """Run one detection recipe and return boxes in original pixels plus timings"""
+    face_cascade, eye_cascade = get_cascade("frontalface"), get_cascade("eye")
+    params = LEGACY_FACE_PARAMS if mode == "legacy" else face_detection_params(gray.shape)
+
+    if mode == "pyramid":
+        # Same steps as utils.haar_pyramid.detect_faces_and_eyes, timed separately
+        t0 = time.perf_counter()
+        pyramid = HaarPyramid(gray, scale_factor=params['scaleFactor'])
+        faces, _ = pyramid.detect("frontalface", min_size=params['minSize'][0],
+                                  min_neighbors=params['minNeighbors'])
+        t1 = time.perf_counter()
+        eyes = []
+        for face in faces:
+            eyes.append(len(pyramid.detect_eyes(face)[0]))
+        t2 = time.perf_counter()
+    else:
+        t0 = time.perf_counter()
+        faces = face_cascade.detectMultiScale(gray, **params)
+        t1 = time.perf_counter()
+
+        eyes = []
+        for (x, y, w, h) in faces:
+            if mode == "adaptive":
+                (rx, ry, rw, rh), min_eye, max_eye = eye_search_bounds(x, y, w, h)
+                eyes.append(len(eye_cascade.detectMultiScale(
+                    gray[ry:ry + rh, rx:rx + rw], scaleFactor=1.1, minNeighbors=3,
+                    minSize=(min_eye, min_eye), maxSize=(max_eye, max_eye))))
+            else:
+                eyes.append(len(eye_cascade.detectMultiScale(gray[y:y + h, x:x + w])))
+        t2 = time.perf_counter()
+
+    boxes = [[x / scale, y / scale, (x + w) / scale, (y + h) / scale] for (x, y, w, h) in faces]
+    return {'boxes': boxes, 'eyes': eyes, 'face_s': t1 - t0, 'eye_s': t2 - t1}
+
+def benchmark_resolution(width: int, height: int, images: int, faces: int, seed: int) -> List[Dict]:
+    totals = {mode: {'face_s': [], 'eye_s': [], 'found': 0, 'detections': 0, 'eyes': 0, 'parity_hits': 0}
+              for mode in MODES}
+    truth_count = legacy_count = 0
+
+    for i in range(images):
+        image, truth = generate_image(width, height, faces, seed + i)
+        encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+        gray, scale = decode_for_detection(encoded)
+        truth_count += len(truth)
+
+        runs = {mode: detect(gray, scale, mode) for mode in MODES}
+        legacy_count += len(runs['legacy']['boxes'])
+        for mode, run in runs.items():
+            totals[mode]['face_s'].append(run['face_s'])
+            totals[mode]['eye_s'].append(run['eye_s'])
+            totals[mode]['found'] += matched(run['boxes'], truth)
+            totals[mode]['detections'] += len(run['boxes'])
+            totals[mode]['eyes'] += sum(run['eyes'])
+            totals[mode]['parity_hits'] += matched(run['boxes'], runs['legacy']['boxes'])
+
+    rows = []
+    for mode, total in totals.items():
+        face_ms = statistics.mean(total['face_s']) * 1000
+        eye_ms = statistics.mean(total['eye_s']) * 1000
+        rows.append({
+            'resolution': f"{width}x{height}",
+            'mode': mode,
+            'images': images,
+            'face_ms': face_ms,
+            'eye_ms': eye_ms,
+            'total_ms': face_ms + eye_ms,
+            'recall': total['found'] / truth_count if truth_count else 1.0,
+            'detections': total['detections'],
+            'eyes': total['eyes'],
+            'parity': total['parity_hits'] / legacy_count if legacy_count else 1.0
+        })
+    for row in rows:
+        row['speedup'] = rows[0]['total_ms'] / row['total_ms'] if row['total_ms'] > 0 else float('inf')
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Haar detection cost and parity, legacy vs adaptive parameters")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080,4000x3000")
+    parser.add_argument("--images", type=int, default=10, help="Images per resolution")
+    parser.add_argument("--faces", type=int, default=4, help="Faces per image")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Optional JSON output file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    rows = []
+    for width, height in parse_resolutions(args.resolutions):
+        logger.info(f"Benchmarking {width}x{height} ({args.images} images)")
+        rows.extend(benchmark_resolution(width, height, args.images, args.faces, args.seed))
+
+    header = (f"{'resolution':<10} {'mode':<9} {'face ms':>8} {'eye ms':>7} {'total ms':>9} "
+              f"{'recall':>7} {'faces':>6} {'eyes':>5} {'parity':>7} {'speedup':>8}")
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(f"{row['resolution']:<10} {row['mode']:<9} {row['face_ms']:>8.1f} {row['eye_ms']:>7.1f} "
+              f"{row['total_ms']:>9.1f} {row['recall']:>7.2f} {row['detections']:>6} {row['eyes']:>5} "
+              f"{row['parity']:>7.2f} {row['speedup']:>7.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Offline benchmark for the face analysis pipeline
+
+Generates deterministic synthetic images with 0-10 faces at several
+resolutions and measures latency and throughput of every service at a range
+of batch sizes. Results are written as JSON; pass ``--compare`` with a
+previous result file to flag regressions.
+
+The result and embedding caches are switched off for every measurement,
+since the same images are processed many times and would otherwise be
+served from cache after the first pass. ``--warm-cache`` adds a separate
+``process_image_comprehensive[warm_cache]`` entry timing fully cached runs.
+
+Usage:
+    python -m benchmarks.pipeline_benchmark --output bench.json
+    python -m benchmarks.pipeline_benchmark --components integrated --warm-cache
+    python -m benchmarks.pipeline_benchmark --compare bench.json --threshold 0.15
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import generate_image, parse_ints, parse_resolutions
+
+logger = logging.getLogger(__name__)
+
+COMPONENTS = ("face_recognition", "yolo", "gender", "anti_spoof", "integrated")
+
+def summarize(latencies: List[float], items_per_batch: int) -> Dict[str, float]:
+    """
+    Summarize batch latencies
+
+    Args:
+        latencies: Wall time of each batch in seconds
+        items_per_batch: Images or faces per batch
+
+    Returns:
+        Mean/p50/p95 latency in milliseconds and throughput in items/sec
+    """
+    ordered = sorted(latencies)
+    total = sum(latencies)
+    return {
+        'mean_ms': statistics.mean(latencies) * 1000,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'throughput': (items_per_batch * len(latencies)) / total if total > 0 else 0.0
+    }
+
+def time_batches(fn: Callable[[Sequence[Any]], Any], items: Sequence[Any], batch_size: int,
+                 repeats: int, warmup: int) -> List[float]:
+    """
+    Time ``fn`` over consecutive batches of ``items``
+
+    Args:
+        fn: Called with one batch (a slice of ``items``)
+        items: Pool of inputs; batches wrap around if the pool is short
+        batch_size: Items per call
+        repeats: Timed calls
+        warmup: Untimed calls made first
+
+    Returns:
+        Per-call latencies in seconds
+    """
+    latencies = []
+    for i in range(warmup + repeats):
+        start = (i * batch_size) % len(items)
+        batch = [items[(start + j) % len(items)] for j in range(batch_size)]
+        t0 = time.perf_counter()
+        fn(batch)
+        elapsed = time.perf_counter() - t0
+        if i >= warmup:
+            latencies.append(elapsed)
+    return latencies
+
+def build_service() -> Tuple[Any, Tuple[Any, Any]]:
+    """
+    Load every model once through the integrated service, with caching off
+
+    Returns:
+        Tuple of (service, (result cache, embedding cache)); the caches are
+        detached from the service and handed back for the warm-cache run
+    """
+    from services.integrated_face_service import IntegratedFaceService
+    service = IntegratedFaceService()
+    caches = (service.result_cache, service.face_recognition.embedding_cache)
+    service.result_cache = None
+    service.face_recognition.embedding_cache = None
+    return service, caches
+
+@contextmanager
+def caches_attached(service, caches: Tuple[Any, Any]):
+    """Temporarily re-attach the result and embedding caches to ``service``"""
+    service.result_cache, service.face_recognition.embedding_cache = caches
+    try:
+        yield
+    finally:
+        service.result_cache = None
+        service.face_recognition.embedding_cache = None
+
+def enroll_random_gallery(service, size: int, seed: int):
+    """Fill the recognition gallery with random unit-norm embeddings"""
+    rng = np.random.default_rng(seed)
+    embeddings = rng.standard_normal((size, 512)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    for i, embedding in enumerate(embeddings):
+        service.face_recognition.add_face_to_database(f"bench_{i}", embedding, "", [], 1.0)
+
+def run_benchmark(args) -> Dict[str, Any]:
+    """Run all configured measurements and return the result document"""
+    service, caches = build_service()
+    enroll_random_gallery(service, args.gallery_size, args.seed)
+
+    resolutions = parse_resolutions(args.resolutions)
+    face_counts = parse_ints(args.faces)
+    batch_sizes = parse_ints(args.batch_sizes)
+    components = set(args.components.split(","))
+    pool_size = max(batch_sizes)
+
+    entries = []
+
+    def record(component: str, operation: str, resolution: str, faces: Optional[int],
+               batch_size: int, latencies: List[float]):
+        entry = {
+            'component': component,
+            'operation': operation,
+            'resolution': resolution,
+            'faces': faces,
+            'batch_size': batch_size,
+            **summarize(latencies, batch_size)
+        }
+        entries.append(entry)
+        logger.info(f"{component}.{operation} {resolution} faces={faces} batch={batch_size}: "
+                    f"p50={entry['p50_ms']:.1f}ms throughput={entry['throughput']:.1f}/s")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for width, height in resolutions:
+            resolution = f"{width}x{height}"
+            crops = []
+
+            for num_faces in face_counts:
+                images = []
+                paths = []
+                for i in range(pool_size):
+                    image, boxes = generate_image(width, height, num_faces, seed=args.seed + i)
+                    path = str(Path(tmp_dir) / f"{resolution}_{num_faces}_{i}.jpg")
+                    cv2.imwrite(path, image)
+                    images.append(image)
+                    paths.append(path)
+                    crops.extend((image, list(box)) for box in boxes)
+
+                for batch_size in batch_sizes:
+                    if "face_recognition" in components:
+                        record("face_recognition", "detect_faces", resolution, num_faces, batch_size, time_batches(
+                            lambda batch: [service.face_recognition.detect_faces(img) for img in batch],
+                            images, batch_size, args.repeats, args.warmup))
+                    if "yolo" in components:
+                        record("yolo", "detect_faces_yolo", resolution, num_faces, batch_size, time_batches(
+                            lambda batch: [service.yolo.detect_faces_yolo(img) for img in batch],
+                            images, batch_size, args.repeats, args.warmup))
+                    if "integrated" in components:
+                        stage_totals: Dict[str, List[float]] = {}
+
+                        def end_to_end(batch):
+                            for path in batch:
+                                result = service.process_image_comprehensive(path)
+                                for stage, seconds in result.get('stage_timings', {}).items():
+                                    stage_totals.setdefault(stage, []).append(seconds)
+
+                        record("integrated", "process_image_comprehensive", resolution, num_faces, batch_size,
+                               time_batches(end_to_end, paths, batch_size, args.repeats, args.warmup))
+                        for stage, seconds in sorted(stage_totals.items()):
+                            record("integrated", f"stage:{stage}", resolution, num_faces, 1, seconds)
+
+                        if args.warm_cache and caches[0] is not None:
+                            # Every path is analysed once first, so each timed call is a cache hit
+                            with caches_attached(service, caches):
+                                for path in paths:
+                                    service.process_image_comprehensive(path)
+                                record("integrated", "process_image_comprehensive[warm_cache]", resolution,
+                                       num_faces, batch_size, time_batches(
+                                           lambda batch: [service.process_image_comprehensive(p) for p in batch],
+                                           paths, batch_size, args.repeats, args.warmup))
+
+            if not crops:
+                continue
+
+            face_regions = [service.yolo.extract_face_from_bbox(image, bbox) for image, bbox in crops]
+            embeddings = [e for e in service.face_recognition.extract_face_embeddings_batch(crops) if e is not None]
+
+            for batch_size in batch_sizes:
+                if "face_recognition" in components:
+                    record("face_recognition", "extract_face_embeddings_batch", resolution, None, batch_size,
+                           time_batches(lambda batch: service.face_recognition.extract_face_embeddings_batch(batch),
+                                        crops, batch_size, args.repeats, args.warmup))
+                    if embeddings:
+                        record("face_recognition", "recognize_face", resolution, None, batch_size,
+                               time_batches(lambda batch: [service.face_recognition.recognize_face(e) for e in batch],
+                                            embeddings, batch_size, args.repeats, args.warmup))
+                if "gender" in components:
+                    record("gender", "batch_predict_gender", resolution, None, batch_size,
+                           time_batches(lambda batch: service.gender_detection.batch_predict_gender(batch),
+                                        face_regions, batch_size, args.repeats, args.warmup))
+                if "anti_spoof" in components:
+                    record("anti_spoof", "comprehensive_spoof_detection", resolution, None, batch_size,
+                           time_batches(lambda batch: [service.anti_spoof.comprehensive_spoof_detection(f) for f in batch],
+                                        face_regions, batch_size, args.repeats, args.warmup))
+
+    return {
+        'meta': {
+            'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'device': str(service.face_recognition.device),
+            'seed': args.seed,
+            'repeats': args.repeats,
+            'warmup': args.warmup,
+            'gallery_size': args.gallery_size,
+            'warm_cache': args.warm_cache
+        },
+        'results': entries
+    }
+
+def _key(entry: Dict[str, Any]):
+    return (entry['component'], entry['operation'], entry['resolution'], entry['faces'], entry['batch_size'])
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Compare p50 latency against a baseline run
+
+    Returns:
+        Entries whose p50 latency grew by more than ``threshold`` (fraction)
+    """
+    baseline_by_key = {_key(entry): entry for entry in baseline['results']}
+    regressions = []
+
+    print(f"{'component.operation':<52} {'res':>10} {'faces':>5} {'batch':>5} {'base p50':>10} {'p50':>10} {'change':>8}")
+    for entry in current['results']:
+        base = baseline_by_key.get(_key(entry))
+        if base is None or base['p50_ms'] <= 0:
+            continue
+        change = entry['p50_ms'] / base['p50_ms'] - 1
+        flag = " !" if change > threshold else ""
+        print(f"{entry['component'] + '.' + entry['operation']:<52} {entry['resolution']:>10} "
+              f"{str(entry['faces']):>5} {entry['batch_size']:>5} {base['p50_ms']:>9.1f}ms "
+              f"{entry['p50_ms']:>9.1f}ms {change:>+7.1%}{flag}")
+        if change > threshold:
+            regressions.append({**entry, 'baseline_p50_ms': base['p50_ms'], 'change': change})
+
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the face analysis pipeline on synthetic images")
+    parser.add_argument("--resolutions", default="640x480,1280x720,1920x1080,4000x3000")
+    parser.add_argument("--faces", default="0,1,3,10", help="Faces per image")
+    parser.add_argument("--batch-sizes", default="1,4,16")
+    parser.add_argument("--components", default=",".join(COMPONENTS))
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--gallery-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="Also time end-to-end runs served from the result cache")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", help="Baseline result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Allowed p50 slowdown before flagging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Per-call service logging would dominate the measurements
+    for name in ("services", "ultralytics"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    results = run_benchmark(args)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    logger.info(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions above {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Supabase REST call latency: a new httpx client per call vs one shared client
+
+Starts a local stand-in for the Supabase REST API (keep-alive HTTP/1.1 that
+answers every request with ``[]``), then replays ``/content/send``-shaped
+requests, each making ``--calls`` sequential REST calls, either
+
+- per_call: opening a new ``httpx.AsyncClient`` for every call (the old
+  ``make_supabase_request``), so every call pays connection setup, or
+- shared: reusing one client with the backend_api pool limits.
+
+``--handshake-ms`` delays the server's first response on each new
+connection to stand in for the TCP + TLS handshake round trips to the
+hosted project; ``--latency-ms`` is added to every response. Pass ``--url``
+to run against a real endpoint instead of the stand-in.
+
+Usage:
+    python -m benchmarks.supabase_client_benchmark
+    python -m benchmarks.supabase_client_benchmark --handshake-ms 60 --latency-ms 20 --concurrency 20
+"""
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+BODY = b"[]"
+
+class StandInServer:
+    """
+    Minimal keep-alive HTTP/1.1 server answering every request with ``[]``
+
+    Args:
+        handshake: Extra seconds before the first response on a connection
+        latency: Extra seconds before every response
+    """
+
+    def __init__(self, handshake: float, latency: float):
+        self.handshake = handshake
+        self.latency = latency
+        self.connections = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        first = True
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+
+                await asyncio.sleep(self.latency + (self.handshake if first else 0.0))
+                first = False
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Content-Length: %d\r\n\r\n%s" % (len(BODY), BODY))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+async def run_mode(mode: str, url: str, requests: int, calls: int, concurrency: int) -> Dict[str, float]:
+    limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30.0)
+    shared = httpx.AsyncClient(base_url=url, limits=limits, timeout=10.0) if mode == "shared" else None
+    slots = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def call(path: str):
+        if shared is not None:
+            response = await shared.get(path)
+        else:
+            async with httpx.AsyncClient(base_url=url, timeout=10.0) as client:
+                response = await client.get(path)
+        response.raise_for_status()
+
+    async def one_request(n: int):
+        async with slots:
+            start = time.perf_counter()
+            for i in range(calls):
+                await call(f"/rest/v1/user_tokens?user_id=eq.{n}&call={i}")
+            latencies.append(time.perf_counter() - start)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(one_request(n) for n in range(requests)))
+        elapsed = time.perf_counter() - start
+    finally:
+        if shared is not None:
+            await shared.aclose()
+
+    return {
+        'requests_per_sec': requests / elapsed,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'mean_ms': statistics.mean(latencies) * 1000
+    }
+
+async def run(args) -> List[Dict]:
+    rows = []
+    for mode in args.modes.split(","):
+        server = None
+        url = args.url
+        if url is None:
+            server = StandInServer(args.handshake_ms / 1000, args.latency_ms / 1000)
+            url = await server.start()
+        try:
+            logger.info(f"Running {mode}: {args.requests} requests x {args.calls} calls against {url}")
+            row = {'mode': mode, **await run_mode(mode, url, args.requests, args.calls, args.concurrency)}
+            row['connections'] = server.connections if server is not None else None
+            rows.append(row)
+        finally:
+            if server is not None:
+                await server.stop()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase REST latency, per-call vs shared httpx client")
+    parser.add_argument("--url", help="Real base URL (default: local stand-in server)")
+    parser.add_argument("--requests", type=int, default=200, help="API requests to replay")
+    parser.add_argument("--calls", type=int, default=5, help="Sequential REST calls per request")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--handshake-ms", type=float, default=40.0,
+                        help="Stand-in connection setup delay (TCP + TLS round trips)")
+    parser.add_argument("--latency-ms", type=float, default=10.0, help="Stand-in per-response delay")
+    parser.add_argument("--modes", default="per_call,shared")
+    parser.add_argument("--output", help="Optional JSON output file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    rows = asyncio.run(run(args))
+
+    header = f"{'mode':<9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'mean ms':>8} {'conns':>6}"
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        connections = row['connections'] if row['connections'] is not None else "-"
+        print(f"{row['mode']:<9} {row['requests_per_sec']:>8.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['mean_ms']:>8.1f} {connections:>6}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+
+if __name__ == "__main__":
+    main()
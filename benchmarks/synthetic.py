@@ -0,0 +1,94 @@
+"""
+Deterministic synthetic images for benchmarks
+"""
+from typing import List, Tuple
+
+import cv2
+import numpy as np
+
+Box = Tuple[int, int, int, int]
+
+def draw_face(image: np.ndarray, box: Box, rng: np.random.Generator):
+    """
+    Draw a simple frontal face (hair, skin, shaded eye sockets, brows, nose
+    and mouth) inside ``box`` = (x1, y1, x2, y2)
+
+    The shading follows the light/dark layout Haar face cascades key on, so
+    the OpenCV detectors find most of these faces.
+    """
+    x1, y1, x2, y2 = box
+    w, h = x2 - x1, y2 - y1
+    cx, cy = x1 + w // 2, y1 + h // 2
+
+    skin = np.array(rng.integers((110, 150, 190), (150, 190, 235)), dtype=np.float64)
+    hair = tuple(int(c) for c in rng.integers(10, 60, 3))
+
+    def shade(factor: float):
+        return tuple(int(c * factor) for c in skin)
+
+    cv2.ellipse(image, (cx, cy - h // 12), (int(w * 0.52), int(h * 0.5)), 0, 0, 360, hair, -1)
+    cv2.ellipse(image, (cx, cy + h // 20), (int(w * 0.45), int(h * 0.47)), 0, 0, 360, shade(1.0), -1)
+
+    eye_y = y1 + int(h * 0.42)
+    eye_dx = int(w * 0.2)
+    for ex in (cx - eye_dx, cx + eye_dx):
+        cv2.ellipse(image, (ex, eye_y), (max(1, w // 7), max(1, h // 12)), 0, 0, 360, shade(0.55), -1)
+        cv2.ellipse(image, (ex, eye_y), (max(1, w // 12), max(1, h // 26)), 0, 0, 360, (200, 200, 200), -1)
+        cv2.circle(image, (ex, eye_y), max(1, w // 26), (30, 25, 20), -1)
+        cv2.line(image, (ex - w // 8, eye_y - h // 9), (ex + w // 8, eye_y - h // 9), hair, max(1, h // 30))
+
+    cv2.ellipse(image, (cx, y1 + int(h * 0.6)), (max(1, w // 14), max(1, h // 10)), 0, 0, 360, shade(1.1), -1)
+    cv2.ellipse(image, (cx, y1 + int(h * 0.77)), (w // 6, h // 24), 0, 0, 360, shade(0.5), -1)
+
+def generate_image(width: int, height: int, num_faces: int, seed: int) -> Tuple[np.ndarray, List[Box]]:
+    """
+    Generate a BGR image with ``num_faces`` non-overlapping synthetic faces
+
+    Args:
+        width: Image width
+        height: Image height
+        num_faces: Number of faces to place (best effort if they don't fit)
+        seed: RNG seed, so the same arguments always give the same image
+
+    Returns:
+        Tuple of (image, list of face boxes (x1, y1, x2, y2))
+    """
+    rng = np.random.default_rng(seed)
+
+    # Smooth, muted background
+    background = rng.integers(60, 190, (max(2, height // 64), max(2, width // 64), 3), dtype=np.uint8)
+    image = cv2.resize(background, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    boxes: List[Box] = []
+    min_side = min(width, height)
+    for _ in range(num_faces * 20):
+        if len(boxes) == num_faces:
+            break
+        face_w = int(rng.uniform(0.08, 0.25) * min_side)
+        face_h = int(face_w * 1.25)
+        if face_w < 24 or face_h >= height or face_w >= width:
+            continue
+        x1 = int(rng.integers(0, width - face_w))
+        y1 = int(rng.integers(0, height - face_h))
+        box = (x1, y1, x1 + face_w, y1 + face_h)
+        if any(_overlaps(box, other) for other in boxes):
+            continue
+        draw_face(image, box, rng)
+        boxes.append(box)
+
+    return image, boxes
+
+def _overlaps(a: Box, b: Box) -> bool:
+    return not (a[2] <= b[0] or b[2] <= a[0] or a[3] <= b[1] or b[3] <= a[1])
+
+def parse_resolutions(value: str) -> List[Tuple[int, int]]:
+    """Parse ``640x480,1920x1080`` into [(640, 480), (1920, 1080)]"""
+    resolutions = []
+    for item in value.split(","):
+        width, height = item.lower().split("x")
+        resolutions.append((int(width), int(height)))
+    return resolutions
+
+def parse_ints(value: str) -> List[int]:
+    """Parse ``1,4,16`` into [1, 4, 16]"""
+    return [int(item) for item in value.split(",") if item]
@@ -1,32 +1,83 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from config import settings
 import os
 
-# Create database engine
-if settings.DATABASE_URL.startswith("sqlite"):
-    # SQLite configuration
-    engine = create_engine(
-        settings.DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
-        echo=settings.DEBUG
+# Async drivers used by the async engine
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+# Named shared-cache in-memory database, visible to every connection in the process
+SHARED_MEMORY_SQLITE = "file:face_recognition"
+SHARED_MEMORY_QUERY = {"mode": "memory", "cache": "shared", "uri": "true"}
+
+def _is_memory_sqlite(url) -> bool:
+    return url.get_backend_name() == "sqlite" and (
+        url.database in (None, "", ":memory:") or url.database == SHARED_MEMORY_SQLITE
     )
-else:
+
+def _shared_memory_url(url):
+    """
+    Point an in-memory SQLite URL at one shared-cache database
+
+    A plain ``:memory:`` database exists only on the connection that opened
+    it, so the async engine (LogSink) would write to a second, empty
+    database. The sync and async drivers both open the named shared-cache
+    database instead, so they see the same tables and rows.
+    """
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return url.set(database=SHARED_MEMORY_SQLITE, query=SHARED_MEMORY_QUERY)
+    return url
+
+def _engine_options(url, is_async: bool) -> dict:
+    """Pool and connection options shared by the sync and async engines"""
+    if url.get_backend_name() == "sqlite":
+        options = {"echo": settings.DEBUG}
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        # One connection per engine keeps the shared in-memory database
+        # alive for the life of the process; files get a real pool
+        if _is_memory_sqlite(url):
+            options["poolclass"] = StaticPool
+        return options
+    
     # PostgreSQL configuration
-    engine = create_engine(
-        settings.DATABASE_URL,
-        echo=settings.DEBUG,
-        pool_pre_ping=True,
-        pool_recycle=300
-    )
+    return {
+        "echo": settings.DEBUG,
+        "pool_pre_ping": True,
+        "pool_recycle": 300,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+def _async_url(url):
+    """Swap the driver of a sync database URL for its async counterpart"""
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+database_url = _shared_memory_url(make_url(settings.DATABASE_URL))
+
+# Create database engine (scripts, migrations, create_tables)
+engine = create_engine(database_url, **_engine_options(database_url, is_async=False))
 
-# Create session factory
+# Create async engine for request handlers
+async_database_url = _async_url(database_url)
+async_engine = create_async_engine(async_database_url, **_engine_options(async_database_url, is_async=True))
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 def get_db() -> Session:
     """
@@ -42,8 +93,77 @@ def create_tables():
     """
     Create all database tables
     """
-    from database.models import Base
+    from database.models import Base, uses_pgvector
+    if uses_pgvector(engine.dialect):
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
     Base.metadata.create_all(bind=engine)
+    add_embedding_vector_column()
+    create_gallery_triggers()
+    if uses_pgvector(engine.dialect):
+        create_vector_index()
+
+def add_embedding_vector_column():
+    """
+    Add face_embeddings.embedding_vector to tables created before it existed
+    """
+    from database.models import FaceEmbedding
+    columns = {column["name"] for column in inspect(engine).get_columns("face_embeddings")}
+    if "embedding_vector" in columns:
+        return
+    column_type = FaceEmbedding.__table__.c.embedding_vector.type.compile(dialect=engine.dialect)
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE face_embeddings ADD COLUMN embedding_vector {column_type}"))
+
+def create_gallery_triggers():
+    """
+    Seed face_gallery_state and install the triggers that bump its counter
+    whenever face_embeddings rows are deleted or their embeddings change
+    """
+    from database.models import FaceGalleryState
+    with engine.begin() as conn:
+        if conn.execute(select(FaceGalleryState.id).where(FaceGalleryState.id == 1)).first() is None:
+            conn.execute(FaceGalleryState.__table__.insert(), [{"id": 1, "changes": 0}])
+        
+        if engine.dialect.name == "postgresql":
+            conn.execute(text(
+                "CREATE OR REPLACE FUNCTION bump_face_gallery_state() RETURNS trigger AS $$ "
+                "BEGIN UPDATE face_gallery_state SET changes = changes + 1 WHERE id = 1; RETURN NULL; END; "
+                "$$ LANGUAGE plpgsql"
+            ))
+            # Statement-level: one bump per DELETE/UPDATE statement, however many rows
+            conn.execute(text("DROP TRIGGER IF EXISTS face_embeddings_changed ON face_embeddings"))
+            conn.execute(text(
+                "CREATE TRIGGER face_embeddings_changed "
+                "AFTER DELETE OR UPDATE OF user_id, embedding, embedding_vector ON face_embeddings "
+                "FOR EACH STATEMENT EXECUTE FUNCTION bump_face_gallery_state()"
+            ))
+        elif engine.dialect.name == "sqlite":
+            for event in ("DELETE", "UPDATE OF user_id, embedding, embedding_vector"):
+                name = "face_embeddings_deleted" if event == "DELETE" else "face_embeddings_updated"
+                conn.execute(text(
+                    f"CREATE TRIGGER IF NOT EXISTS {name} AFTER {event} ON face_embeddings "
+                    "BEGIN UPDATE face_gallery_state SET changes = changes + 1 WHERE id = 1; END"
+                ))
+
+def create_vector_index():
+    """
+    Build the pgvector nearest-neighbour index selected by PGVECTOR_INDEX
+    (hnsw, ivfflat or none)
+    """
+    with engine.begin() as conn:
+        if settings.PGVECTOR_INDEX == "hnsw":
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_face_embeddings_embedding_vector_hnsw "
+                "ON face_embeddings USING hnsw (embedding_vector vector_l2_ops)"
+            ))
+        elif settings.PGVECTOR_INDEX == "ivfflat":
+            # IVFFlat clusters existing rows, so build it after the initial load
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_face_embeddings_embedding_vector_ivfflat "
+                "ON face_embeddings USING ivfflat (embedding_vector vector_l2_ops) "
+                f"WITH (lists = {int(settings.PGVECTOR_IVFFLAT_LISTS)})"
+            ))
 
 def drop_tables():
     """
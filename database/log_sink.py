@@ -0,0 +1,227 @@
+"""
+Write-behind sink for request logs (recognition, anti-spoof, gender)
+"""
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from database.models import FaceRecognitionLog, AntiSpoofLog, GenderDetectionLog
+from utils.metrics import LOG_SINK_FLUSH_LATENCY, LOG_SINK_RECORDS, LOG_SINK_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+DROP_POLICIES = ("drop_newest", "drop_oldest")
+
+class LogSink:
+    """
+    Buffers log rows in memory and writes them in bulk on a background task
+
+    The request path only calls ``enqueue``, which never touches the
+    database. A background task drains the queue and inserts each batch with
+    one ``executemany`` per table and a single commit on an async session. When the queue is
+    full, ``drop_newest`` rejects the incoming record and ``drop_oldest``
+    discards the oldest queued one to make room.
+
+    Args:
+        session_factory: Callable returning a new ``AsyncSession``
+        max_queue: Maximum number of queued records
+        batch_size: Maximum number of records per flush
+        flush_interval: Seconds to wait for more records before flushing
+        drop_policy: ``drop_newest`` or ``drop_oldest``
+    """
+
+    def __init__(self, session_factory: Callable, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, drop_policy: str = "drop_newest"):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.session_factory = session_factory
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self):
+        """Start the background flush task"""
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Log sink started (queue={self.max_queue}, batch={self.batch_size}, policy={self.drop_policy})")
+
+    async def stop(self):
+        """Stop the background task and flush whatever is still queued"""
+        if self._task is None:
+            return
+        # Let the task drain the queue rather than cancelling a batch mid-write
+        self._stopping = True
+        await self._task
+        self._task = None
+        logger.info("Log sink stopped")
+
+    def enqueue(self, model, record: Dict[str, Any]) -> bool:
+        """
+        Queue a row for ``model`` without blocking
+
+        Must be called from the event loop thread.
+
+        Returns:
+            True if the record was queued
+        """
+        table = model.__tablename__
+        if self._queue is None:
+            self._count_dropped(table)
+            return False
+
+        record.setdefault('created_at', datetime.now(timezone.utc))
+
+        if self._queue.full():
+            if self.drop_policy == "drop_newest":
+                self._count_dropped(table)
+                return False
+            oldest_model, _ = self._queue.get_nowait()
+            self._count_dropped(oldest_model.__tablename__)
+
+        self._queue.put_nowait((model, record))
+        LOG_SINK_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue': self.max_queue,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'drop_policy': self.drop_policy,
+            'running': self._task is not None
+        }
+
+    async def _run(self):
+        while not (self._stopping and self._queue.empty()):
+            # Collect until the batch is full or the flush interval elapses
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            LOG_SINK_QUEUE_DEPTH.set(self._queue.qsize())
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        if not batch:
+            return
+
+        rows_by_model = defaultdict(list)
+        for model, record in batch:
+            rows_by_model[model].append(record)
+
+        start = time.perf_counter()
+        try:
+            await self._write(rows_by_model)
+        except Exception as e:
+            logger.error(f"Error flushing {len(batch)} log records: {e}")
+            self.failed += len(batch)
+            for model, rows in rows_by_model.items():
+                LOG_SINK_RECORDS.labels(table=model.__tablename__, result='failed').inc(len(rows))
+            return
+        finally:
+            LOG_SINK_FLUSH_LATENCY.observe(time.perf_counter() - start)
+
+        self.written += len(batch)
+        for model, rows in rows_by_model.items():
+            LOG_SINK_RECORDS.labels(table=model.__tablename__, result='written').inc(len(rows))
+
+    async def _write(self, rows_by_model: Dict[Any, List[Dict[str, Any]]]):
+        async with self.session_factory() as session:
+            for model, rows in rows_by_model.items():
+                await session.execute(model.__table__.insert(), rows)
+            await session.commit()
+
+    def _count_dropped(self, table: str):
+        self.dropped += 1
+        LOG_SINK_RECORDS.labels(table=table, result='dropped').inc()
+
+def recognition_log_records(results: Dict[str, Any], ip_address: Optional[str] = None,
+                            user_agent: Optional[str] = None) -> List[Tuple[Any, Dict[str, Any]]]:
+    """
+    Build log rows for a ``process_image_comprehensive`` result
+
+    Args:
+        results: Comprehensive analysis results
+        ip_address: Client address
+        user_agent: Client user agent
+
+    Returns:
+        List of (model, row) pairs for ``LogSink.enqueue``
+    """
+    records = []
+    timings = results.get('stage_timings') or {}
+    processing_time = results.get('processing_time', 0.0)
+
+    for face in results.get('faces_analyzed', []):
+        if not face.get('success', False):
+            continue
+
+        recognition = face.get('face_recognition', {})
+        anti_spoof = face.get('anti_spoof', {})
+        gender = face.get('gender_detection', {})
+        face_timings = face.get('stage_timings', {})
+        has_gender = gender.get('gender') in ('male', 'female')
+
+        # Detect-only plans never attempted recognition
+        if recognition.get('skipped', False):
+            continue
+
+        records.append((FaceRecognitionLog, {
+            'user_id': None,
+            'recognized_user_id': recognition.get('user_id'),
+            'input_image_path': results['image_path'],
+            'confidence': recognition.get('confidence', 0.0),
+            'is_spoof': anti_spoof.get('is_spoof', False),
+            'spoof_confidence': anti_spoof.get('confidence'),
+            'gender': gender.get('gender') if has_gender else None,
+            'gender_confidence': gender.get('confidence') if has_gender else None,
+            'processing_time': processing_time,
+            'ip_address': ip_address,
+            'user_agent': user_agent
+        }))
+
+        # Per-face model times; request timings only say the model ran for this
+        # request rather than being replayed from the result cache
+        if 'anti_spoof' in timings and 'anti_spoof' in face_timings:
+            records.append((AntiSpoofLog, {
+                'user_id': recognition.get('user_id'),
+                'input_image_path': results['image_path'],
+                'is_spoof': anti_spoof.get('is_spoof', False),
+                'spoof_confidence': anti_spoof.get('confidence', 0.0),
+                'spoof_type': anti_spoof.get('spoof_type'),
+                'processing_time': face_timings['anti_spoof'],
+                'ip_address': ip_address
+            }))
+
+        if has_gender and 'gender' in timings and 'gender' in face_timings:
+            records.append((GenderDetectionLog, {
+                'user_id': recognition.get('user_id'),
+                'input_image_path': results['image_path'],
+                'detected_gender': gender['gender'],
+                'confidence': gender.get('confidence', 0.0),
+                'age_estimate': gender.get('age_estimate'),
+                'processing_time': face_timings['gender']
+            }))
+
+    return records
@@ -3,12 +3,57 @@ Database models for Face Recognition System
 """
 from sqlalchemy import Column, Integer, String, DateTime, Float, Boolean, Text, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 import json
+import numpy as np
+
+try:
+    from pgvector.sqlalchemy import Vector
+except ImportError:
+    Vector = None
 
 Base = declarative_base()
 
+# FaceNet (InceptionResnetV1) embedding size
+EMBEDDING_DIM = 512
+
+def uses_pgvector(dialect) -> bool:
+    """True when vectors are stored in a native pgvector column"""
+    return dialect.name == "postgresql" and Vector is not None
+
+class EmbeddingVector(TypeDecorator):
+    """
+    float32 embedding column: pgvector ``vector(dim)`` on PostgreSQL when the
+    pgvector package is installed, raw float32 bytes everywhere else
+    """
+    impl = LargeBinary
+    cache_ok = True
+    
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        super().__init__()
+        self.dim = dim
+    
+    def load_dialect_impl(self, dialect):
+        if uses_pgvector(dialect):
+            return dialect.type_descriptor(Vector(self.dim))
+        return dialect.type_descriptor(LargeBinary())
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        vector = np.asarray(value, dtype=np.float32).reshape(-1)
+        return vector if uses_pgvector(dialect) else vector.tobytes()
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if uses_pgvector(dialect):
+            return np.asarray(value, dtype=np.float32)
+        return np.frombuffer(value, dtype=np.float32)
+
 class User(Base):
     """User model for storing user information"""
     __tablename__ = "users"
@@ -22,7 +67,11 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     
     # Relationship with face embeddings
-    face_embeddings = relationship("FaceEmbedding", back_populates="user")
+    face_embeddings = relationship(
+        "FaceEmbedding",
+        back_populates="user",
+        primaryjoin="User.user_id == foreign(FaceEmbedding.user_id)"
+    )
 
 class FaceEmbedding(Base):
     """Face embedding model for storing face recognition data"""
@@ -31,6 +80,7 @@ class FaceEmbedding(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String(100), index=True, nullable=False)
     embedding = Column(LargeBinary, nullable=False)  # Face embedding vector
+    embedding_vector = Column(EmbeddingVector(EMBEDDING_DIM), nullable=True)  # Searchable copy (pgvector on PostgreSQL)
     face_image_path = Column(String(500), nullable=True)  # Path to face image
     face_bbox = Column(Text, nullable=True)  # JSON string of bounding box coordinates
     confidence = Column(Float, nullable=False)
@@ -40,7 +90,24 @@ class FaceEmbedding(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship with user
-    user = relationship("User", back_populates="face_embeddings")
+    user = relationship(
+        "User",
+        back_populates="face_embeddings",
+        primaryjoin="User.user_id == foreign(FaceEmbedding.user_id)"
+    )
+
+class FaceGalleryState(Base):
+    """
+    Single-row change counter for face_embeddings
+
+    Triggers installed by ``create_gallery_triggers`` bump ``changes`` on
+    every delete or embedding update; together with ``max(face_embeddings.id)``
+    (which covers inserts) it versions the gallery without counting rows.
+    """
+    __tablename__ = "face_gallery_state"
+    
+    id = Column(Integer, primary_key=True)
+    changes = Column(Integer, nullable=False, default=0)
 
 class FaceRecognitionLog(Base):
     """Log model for face recognition attempts"""
@@ -101,6 +168,3 @@ class ModelPerformance(Base):
     inference_time = Column(Float, nullable=False)
     test_date = Column(DateTime(timezone=True), server_default=func.now())
     test_data_size = Column(Integer, nullable=True)
-
-# Import relationship after Base is defined
-from sqlalchemy.orm import relationship
@@ -74,7 +74,7 @@ async def health_check():
         }
 
 @app.post("/test/face-detection")
-async def test_face_detection(file: UploadFile = File(...)):
+async def test_face_detection(file: UploadFile = File(...), detect_eyes: bool = True):
     """Simple face detection test"""
     try:
         # Validate file
@@ -91,7 +91,7 @@ async def test_face_detection(file: UploadFile = File(...)):
             buffer.write(content)
         
         # Process image
-        results = face_service.detect_faces(str(file_path))
+        results = face_service.detect_faces(str(file_path), detect_eyes=detect_eyes)
         
         # Clean up uploaded file
         try:
@@ -108,7 +108,7 @@ async def test_face_detection(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.post("/api/v1/recognize")
-async def recognize_faces(file: UploadFile = File(...)):
+async def recognize_faces(file: UploadFile = File(...), detect_eyes: bool = True):
     """Advanced face recognition with all features"""
     try:
         # Validate file
@@ -125,7 +125,7 @@ async def recognize_faces(file: UploadFile = File(...)):
             buffer.write(content)
         
         # Process image with advanced analysis
-        results = face_service.detect_faces(str(file_path))
+        results = face_service.detect_faces(str(file_path), detect_eyes=detect_eyes)
         
         # Clean up uploaded file
         try:
@@ -241,8 +241,8 @@ async def detect_gender(file: UploadFile = File(...)):
             content = await file.read()
             buffer.write(content)
         
-        # Process image
-        results = face_service.detect_faces(str(file_path))
+        # Process image (eye counts are not used here)
+        results = face_service.detect_faces(str(file_path), detect_eyes=False)
         
         # Extract gender information
         gender_results = []
@@ -290,8 +290,8 @@ async def anti_spoof_detection(file: UploadFile = File(...)):
             content = await file.read()
             buffer.write(content)
         
-        # Process image
-        results = face_service.detect_faces(str(file_path))
+        # Process image (eye counts are not used here)
+        results = face_service.detect_faces(str(file_path), detect_eyes=False)
         
         # Anti-spoofing analysis
         spoof_results = []
@@ -25,6 +25,18 @@ class Settings(BaseSettings):
     POSTGRES_SERVER: Optional[str] = None
     POSTGRES_PORT: Optional[str] = None
     POSTGRES_DB: Optional[str] = None
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30  # seconds
+    
+    # Gallery Settings
+    GALLERY_BACKEND: str = "memory"  # memory, database (pgvector on PostgreSQL)
+    GALLERY_MAX_EMBEDDINGS_PER_USER: int = 10
+    GALLERY_COARSE_K: int = 32  # users shortlisted by centroid, 0 = exhaustive
+    GALLERY_USER_TOP_K: int = 1  # nearest exemplars averaged per user
+    PGVECTOR_INDEX: str = "hnsw"  # hnsw, ivfflat, none
+    PGVECTOR_IVFFLAT_LISTS: int = 100
+    PGVECTOR_SEARCH_EFFORT: int = 0  # hnsw.ef_search / ivfflat.probes, 0 = server default
     
     # Model Settings
     MODELS_DIR: str = "models"
@@ -37,6 +49,7 @@ class Settings(BaseSettings):
     FACE_DETECTION_CONFIDENCE: float = 0.5
     FACE_RECOGNITION_THRESHOLD: float = 0.6
     MAX_FACES_PER_IMAGE: int = 10
+    DETECTION_MAX_SIDE: int = 1280  # detectors run on a copy this large, 0 = full resolution
     
     # Anti-Spoofing Settings
     ANTI_SPOOF_THRESHOLD: float = 0.5
@@ -60,6 +73,30 @@ class Settings(BaseSettings):
     LOG_LEVEL: str = "INFO"
     LOG_FILE: str = "logs/face_recognition.log"
     
+    # Profiling Settings
+    PROFILE_DIR: str = "profiles"
+    ADMIN_TOKEN: Optional[str] = None  # Admin endpoints are disabled when unset
+    
+    # Result Cache Settings
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_MAX_ENTRIES: int = 1024
+    RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # 64MB
+    RESULT_CACHE_TTL: int = 300  # seconds
+    RESULT_CACHE_PHASH_DISTANCE: int = 0  # 0 = exact matches only
+    
+    # Embedding Cache Settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 10000
+    EMBEDDING_CACHE_MAX_BYTES: int = 32 * 1024 * 1024  # 32MB
+    EMBEDDING_CACHE_TTL: int = 600  # seconds
+    
+    # Request Log Sink Settings
+    LOG_SINK_ENABLED: bool = True
+    LOG_SINK_MAX_QUEUE: int = 10000
+    LOG_SINK_BATCH_SIZE: int = 500
+    LOG_SINK_FLUSH_INTERVAL: float = 1.0  # seconds
+    LOG_SINK_DROP_POLICY: str = "drop_newest"  # drop_newest, drop_oldest
+    
     # OpenVINO Settings
     OPENVINO_DEVICE: str = "CPU"  # CPU, GPU, AUTO
     ENABLE_OPENVINO: bool = True
@@ -10,6 +10,11 @@ from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import json
 
+from services.face_store import FaceStore
+from utils.cascades import face_detection_params, get_cascade
+from utils.haar_pyramid import detect_faces_and_eyes
+from utils.image_decode import decode_for_detection
+
 logger = logging.getLogger(__name__)
 
 class AdvancedFaceService:
@@ -19,52 +24,31 @@ class AdvancedFaceService:
     
     def __init__(self):
         self.face_cascade = None
-        self.eye_cascade = None
-        self.known_faces = {}
-        self.face_encodings = {}
+        self.face_store = FaceStore("known_faces", dim=64 * 64)
+        self.known_faces = self.face_store.metadata
         self.load_models()
         self.load_known_faces()
     
     def load_models(self):
         """Load face detection models"""
         try:
-            # Load Haar Cascade for face detection
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-            self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+            # Load Haar Cascade for face detection (detection fetches the
+            # calling thread's instances, eye cascade included, from the registry)
+            self.face_cascade = get_cascade("frontalface")
             logger.info("Face detection models loaded successfully")
         except Exception as e:
             logger.error(f"Error loading face detection models: {e}")
             raise
     
     def load_known_faces(self):
-        """Load known face encodings from file"""
+        """Load known face encodings, importing the legacy JSON file once"""
         try:
-            faces_file = Path("known_faces.json")
-            if faces_file.exists():
-                with open(faces_file, 'r') as f:
-                    data = json.load(f)
-                    self.known_faces = data.get('faces', {})
-                    self.face_encodings = data.get('encodings', {})
-                logger.info(f"Loaded {len(self.known_faces)} known faces")
-            else:
-                logger.info("No known faces file found, starting fresh")
+            self.face_store.load(legacy_json=Path("known_faces.json"))
+            self.known_faces = self.face_store.metadata
+            logger.info(f"Loaded {len(self.known_faces)} known faces")
         except Exception as e:
             logger.error(f"Error loading known faces: {e}")
     
-    def save_known_faces(self):
-        """Save known face encodings to file"""
-        try:
-            faces_file = Path("known_faces.json")
-            data = {
-                'faces': self.known_faces,
-                'encodings': self.face_encodings
-            }
-            with open(faces_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            logger.info("Known faces saved successfully")
-        except Exception as e:
-            logger.error(f"Error saving known faces: {e}")
-    
     def extract_face_features(self, face_image: np.ndarray) -> np.ndarray:
         """
         Extract features from face image using simple method
@@ -127,41 +111,44 @@ class AdvancedFaceService:
             logger.error(f"Error calculating face similarity: {e}")
             return 0.0
     
-    def detect_faces(self, image_path: str) -> Dict[str, Any]:
+    def detect_faces(self, image_path: str, detect_eyes: bool = True) -> Dict[str, Any]:
         """
         Detect faces in an image with advanced analysis
         
         Args:
             image_path: Path to input image
+            detect_eyes: Count eyes in each face (``eyes_detected`` is None when off)
             
         Returns:
             Detection results with analysis
         """
         try:
-            # Load image
-            image = cv2.imread(image_path)
+            # Decode once, at the reduced resolution detection needs. Face crops
+            # come from the same color image: features are resized to 64x64
+            # and the analysis uses scale-free ratios, so full-size crops buy
+            # nothing but a second decode
+            image, scale = decode_for_detection(image_path, color=True)
             if image is None:
                 raise ValueError(f"Could not load image: {image_path}")
-            
-            # Convert to grayscale
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # Detect faces with optimized parameters
-            faces = self.face_cascade.detectMultiScale(gray, scaleFactor=1.05, minNeighbors=3, minSize=(30, 30))
+            # Detect faces, and eyes in the upper face for validation, over one
+            # shared pyramid with parameters sized to the image
+            faces, _ = detect_faces_and_eyes(gray, face_detection_params(gray.shape), detect_eyes)
             
             # Process results
             detected_faces = []
-            for i, (x, y, w, h) in enumerate(faces):
+            for i, (x, y, w, h, eyes) in enumerate(zip(faces['x'], faces['y'], faces['w'],
+                                                       faces['h'], faces['eyes'])):
                 # Extract face region
                 face_region = image[y:y+h, x:x+w]
                 
+                # Report the box in original image pixels
+                ox, oy, ow, oh = (int(round(v / scale)) for v in (x, y, w, h))
+                
                 # Extract features
                 features = self.extract_face_features(face_region)
                 
-                # Detect eyes for additional validation
-                face_gray = gray[y:y+h, x:x+w]
-                eyes = self.eye_cascade.detectMultiScale(face_gray)
-                
                 # Analyze face characteristics
                 face_analysis = self.analyze_face_characteristics(face_region)
                 
@@ -170,11 +157,11 @@ class AdvancedFaceService:
                 
                 face_data = {
                     'face_id': i,
-                    'bbox': [int(x), int(y), int(x + w), int(y + h)],
+                    'bbox': [ox, oy, ox + ow, oy + oh],
                     'confidence': 0.8,  # Haar cascade confidence
-                    'width': int(w),
-                    'height': int(h),
-                    'eyes_detected': len(eyes),
+                    'width': ow,
+                    'height': oh,
+                    'eyes_detected': int(eyes) if detect_eyes else None,
                     'face_analysis': face_analysis,
                     'recognized_user': recognized_user,
                     'recognition_confidence': confidence,
@@ -188,9 +175,9 @@ class AdvancedFaceService:
                 'faces_detected': len(detected_faces),
                 'faces': detected_faces,
                 'image_info': {
-                    'width': image.shape[1],
-                    'height': image.shape[0],
-                    'channels': image.shape[2] if len(image.shape) > 2 else 1
+                    'width': int(round(image.shape[1] / scale)),
+                    'height': int(round(image.shape[0] / scale)),
+                    'channels': 3  # decoded as BGR
                 }
             }
             
@@ -272,18 +259,11 @@ class AdvancedFaceService:
             Tuple of (user_id, confidence)
         """
         try:
-            if len(self.face_encodings) == 0 or len(features) == 0:
+            if len(self.face_store) == 0 or len(features) == 0:
                 return None, 0.0
             
-            best_match = None
-            best_confidence = 0.0
-            
-            for user_id, stored_features in self.face_encodings.items():
-                if len(stored_features) > 0:
-                    similarity = self.calculate_face_similarity(features, np.array(stored_features))
-                    if similarity > best_confidence:
-                        best_confidence = similarity
-                        best_match = user_id
+            # Cosine similarity against all known faces in one matrix product
+            best_match, best_confidence = self.face_store.search(features)
             
             # Threshold for recognition
             if best_confidence > 0.7:
@@ -309,7 +289,7 @@ class AdvancedFaceService:
         """
         try:
             # Detect faces in image
-            result = self.detect_faces(image_path)
+            result = self.detect_faces(image_path, detect_eyes=False)
             
             if not result['success'] or result['faces_detected'] == 0:
                 return {
@@ -334,17 +314,12 @@ class AdvancedFaceService:
                     'user_id': user_id
                 }
             
-            # Store face data
-            self.known_faces[user_id] = {
+            # Store face data (appends one row and one log record)
+            self.face_store.add(user_id, features, {
                 'name': user_name,
                 'image_path': image_path,
                 'face_analysis': best_face['face_analysis']
-            }
-            
-            self.face_encodings[user_id] = features.tolist()
-            
-            # Save to file
-            self.save_known_faces()
+            })
             
             return {
                 'success': True,
@@ -382,16 +357,10 @@ class AdvancedFaceService:
             user_id: User identifier
             
         Returns:
-            Success status
+            True if the face existed and was deleted
         """
         try:
-            if user_id in self.known_faces:
-                del self.known_faces[user_id]
-            if user_id in self.face_encodings:
-                del self.face_encodings[user_id]
-            
-            self.save_known_faces()
-            return True
+            return self.face_store.delete(user_id)
             
         except Exception as e:
             logger.error(f"Error deleting face: {e}")
@@ -0,0 +1,264 @@
+"""
+Append-only binary store for known face feature vectors
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def _fsync_dir(path: Path):
+    """Persist renames and new directory entries in ``path`` (no-op where unsupported)"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class FaceStore:
+    """
+    Binary face feature store with an append-only log and compaction
+
+    Two files live next to ``base_path``:
+
+    - ``<base>.<generation>.vec``: raw float32 rows, one per enrolled face
+    - ``<base>.log``: JSON lines; a header naming the current vector file,
+      then ``add`` (user_id, row, metadata) and ``delete`` records
+
+    Adding or deleting a face appends one row and/or one log line instead of
+    rewriting everything. Replaced and deleted rows stay on disk until
+    compaction rewrites the live rows into a new generation and atomically
+    swaps the log. Recognition is a single matrix product against the
+    L2-normalised live rows.
+    """
+
+    def __init__(self, base_path: str = "known_faces", dim: int = 4096,
+                 compact_ratio: float = 0.5, min_compact_rows: int = 64):
+        self.base_path = Path(base_path)
+        self.log_path = self.base_path.with_name(self.base_path.name + ".log")
+        self.dim = dim
+        self.compact_ratio = compact_ratio
+        self.min_compact_rows = min_compact_rows
+
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+        self.rows: Dict[str, int] = {}
+        self.generation = 0
+
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._count = 0
+        self._live_ids: List[str] = []
+        self._live_matrix: Optional[np.ndarray] = None
+
+    @property
+    def vec_path(self) -> Path:
+        return self.base_path.with_name(f"{self.base_path.name}.{self.generation}.vec")
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def load(self, legacy_json: Optional[Path] = None):
+        """
+        Load the store from disk
+
+        Args:
+            legacy_json: ``known_faces.json`` from the old JSON format; it is
+                imported once when no log exists yet
+        """
+        if not self.log_path.exists():
+            self._write_header()
+            if legacy_json is not None and legacy_json.exists():
+                self._import_legacy(legacy_json)
+            return
+
+        records = []
+        with open(self.log_path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted append
+                    logger.warning(f"Skipping unreadable record in {self.log_path}")
+
+        if records and records[0].get("op") == "header":
+            self.generation = records[0]["generation"]
+
+        if self.vec_path.exists():
+            raw = np.fromfile(self.vec_path, dtype=np.float32)
+            self._count = raw.size // self.dim
+            self._vectors = raw[:self._count * self.dim].reshape(self._count, self.dim)
+            if raw.size != self._count * self.dim:
+                # Drop a torn trailing row so later appends stay row-aligned
+                os.truncate(self.vec_path, self._count * self.dim * 4)
+        else:
+            self._count = 0
+
+        for record in records:
+            op = record.get("op")
+            if op == "add" and record["row"] < self._count:
+                self.rows[record["user_id"]] = record["row"]
+                self.metadata[record["user_id"]] = record.get("meta", {})
+            elif op == "delete":
+                self.rows.pop(record["user_id"], None)
+                self.metadata.pop(record["user_id"], None)
+
+        self._live_matrix = None
+        logger.info(f"Loaded {len(self.rows)} known faces ({self._count} rows, generation {self.generation})")
+
+    def add(self, user_id: str, features: np.ndarray, meta: Dict[str, Any]):
+        """
+        Add or replace the face for ``user_id``
+
+        Args:
+            user_id: User identifier
+            features: Feature vector of length ``dim``
+            meta: JSON-serialisable user metadata
+        """
+        vector = np.asarray(features, dtype=np.float32).reshape(self.dim)
+        row = self._count
+
+        with open(self.vec_path, "ab") as f:
+            f.write(vector.tobytes())
+        self._append_log({"op": "add", "user_id": user_id, "row": row, "meta": meta})
+
+        self._append_row(vector)
+        self.rows[user_id] = row
+        self.metadata[user_id] = meta
+        self._live_matrix = None
+
+        self.maybe_compact()
+
+    def delete(self, user_id: str) -> bool:
+        """
+        Delete the face for ``user_id``
+
+        Returns:
+            True if the user was known
+        """
+        if user_id not in self.rows:
+            return False
+
+        self._append_log({"op": "delete", "user_id": user_id})
+        del self.rows[user_id]
+        self.metadata.pop(user_id, None)
+        self._live_matrix = None
+
+        self.maybe_compact()
+        return True
+
+    def search(self, features: np.ndarray) -> Tuple[Optional[str], float]:
+        """
+        Find the most similar known face by cosine similarity
+
+        Returns:
+            Tuple of (user_id, similarity); user_id is None for an empty store
+        """
+        if not self.rows:
+            return None, 0.0
+
+        query = np.asarray(features, dtype=np.float32).reshape(self.dim)
+        query_norm = np.linalg.norm(query)
+        if query_norm == 0:
+            return None, 0.0
+
+        matrix = self._normalized_live_matrix()
+        similarities = matrix @ (query / query_norm)
+        best = int(np.argmax(similarities))
+        return self._live_ids[best], max(0.0, float(similarities[best]))
+
+    def maybe_compact(self):
+        """Compact once dead rows make up more than ``compact_ratio`` of the file"""
+        dead = self._count - len(self.rows)
+        if self._count >= self.min_compact_rows and dead > self.compact_ratio * self._count:
+            self.compact()
+
+    def compact(self):
+        """
+        Rewrite live rows into a new vector file generation
+
+        The new vector file is written under a fresh name and fsynced
+        before the log is swapped with ``os.replace``, and the directory is
+        fsynced after the swap, so a crash leaves either the old or the new
+        generation intact.
+        """
+        old_vec_path = self.vec_path
+        user_ids = list(self.rows)
+        vectors = self._vectors[[self.rows[user_id] for user_id in user_ids]] if user_ids else \
+            np.empty((0, self.dim), dtype=np.float32)
+
+        self.generation += 1
+        with open(self.vec_path, "wb") as f:
+            vectors.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        _fsync_dir(self.vec_path.parent)
+
+        tmp_log = self.log_path.with_name(self.log_path.name + ".tmp")
+        with open(tmp_log, "w") as f:
+            f.write(json.dumps({"op": "header", "generation": self.generation, "dim": self.dim}) + "\n")
+            for row, user_id in enumerate(user_ids):
+                f.write(json.dumps({"op": "add", "user_id": user_id, "row": row,
+                                    "meta": self.metadata.get(user_id, {})}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_log, self.log_path)
+        _fsync_dir(self.log_path.parent)
+
+        try:
+            old_vec_path.unlink()
+        except FileNotFoundError:
+            pass
+
+        self._vectors = np.array(vectors, dtype=np.float32)
+        self._count = len(user_ids)
+        self.rows = {user_id: row for row, user_id in enumerate(user_ids)}
+        self._live_matrix = None
+        logger.info(f"Compacted known faces store to {self._count} rows (generation {self.generation})")
+
+    def _normalized_live_matrix(self) -> np.ndarray:
+        if self._live_matrix is None:
+            self._live_ids = list(self.rows)
+            live = self._vectors[[self.rows[user_id] for user_id in self._live_ids]]
+            norms = np.linalg.norm(live, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            self._live_matrix = live / norms
+        return self._live_matrix
+
+    def _append_row(self, vector: np.ndarray):
+        # Grow geometrically so repeated adds stay amortised O(1)
+        if self._count == len(self._vectors):
+            grown = np.empty((max(16, 2 * len(self._vectors)), self.dim), dtype=np.float32)
+            grown[:self._count] = self._vectors[:self._count]
+            self._vectors = grown
+        self._vectors[self._count] = vector
+        self._count += 1
+
+    def _append_log(self, record: Dict[str, Any]):
+        with open(self.log_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _write_header(self):
+        with open(self.log_path, "w") as f:
+            f.write(json.dumps({"op": "header", "generation": self.generation, "dim": self.dim}) + "\n")
+
+    def _import_legacy(self, legacy_json: Path):
+        with open(legacy_json, "r") as f:
+            data = json.load(f)
+        faces = data.get('faces', {})
+        imported = 0
+        for user_id, encoding in data.get('encodings', {}).items():
+            if len(encoding) == self.dim:
+                self.add(user_id, np.array(encoding, dtype=np.float32), faces.get(user_id, {}))
+                imported += 1
+        logger.info(f"Imported {imported} known faces from {legacy_json}")
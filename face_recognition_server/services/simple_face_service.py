@@ -6,6 +6,9 @@ import numpy as np
 import logging
 from typing import List, Dict, Any, Optional
 
+from utils.cascades import get_cascade
+from utils.image_decode import decode_for_detection
+
 logger = logging.getLogger(__name__)
 
 class SimpleFaceService:
@@ -20,8 +23,9 @@ class SimpleFaceService:
     def load_models(self):
         """Load face detection models"""
         try:
-            # Load Haar Cascade for face detection
-            self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+            # Load Haar Cascade for face detection (detection fetches the
+            # calling thread's instance from the registry)
+            self.face_cascade = get_cascade("frontalface")
             logger.info("Face detection model loaded successfully")
         except Exception as e:
             logger.error(f"Error loading face detection model: {e}")
@@ -38,25 +42,24 @@ class SimpleFaceService:
             Detection results
         """
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
+            # Decode straight to grayscale at detection resolution
+            gray, scale = decode_for_detection(image_path)
+            if gray is None:
                 raise ValueError(f"Could not load image: {image_path}")
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
             # Detect faces
-            faces = self.face_cascade.detectMultiScale(gray, 1.1, 4)
+            faces = get_cascade("frontalface").detectMultiScale(gray, 1.1, 4)
             
             # Process results
             detected_faces = []
             for (x, y, w, h) in faces:
+                # Map back to original image coordinates
+                x, y, w, h = (int(round(v / scale)) for v in (x, y, w, h))
                 face_data = {
-                    'bbox': [int(x), int(y), int(x + w), int(y + h)],
+                    'bbox': [x, y, x + w, y + h],
                     'confidence': 0.8,  # Haar cascade doesn't provide confidence
-                    'width': int(w),
-                    'height': int(h)
+                    'width': w,
+                    'height': h
                 }
                 detected_faces.append(face_data)
             
@@ -66,9 +69,9 @@ class SimpleFaceService:
                 'faces_detected': len(detected_faces),
                 'faces': detected_faces,
                 'image_info': {
-                    'width': image.shape[1],
-                    'height': image.shape[0],
-                    'channels': image.shape[2] if len(image.shape) > 2 else 1
+                    'width': int(round(gray.shape[1] / scale)),
+                    'height': int(round(gray.shape[0] / scale)),
+                    'channels': 3  # cv2.imread decodes to BGR
                 }
             }
             
@@ -9,6 +9,8 @@ import logging
 from pathlib import Path
 import uuid
 
+from utils.cascades import get_cascade, preload
+
 # Logging ayarla
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -33,6 +35,11 @@ app.add_middleware(
 upload_dir = Path("uploads")
 upload_dir.mkdir(exist_ok=True)
 
+@app.on_event("startup")
+async def startup_event():
+    """Cascade XML dosyalarını istekten önce bir kez yükle"""
+    preload(["frontalface"])
+
 @app.get("/")
 async def root():
     """Ana endpoint"""
@@ -128,8 +135,7 @@ async def test_face_detection(file: UploadFile = File(...)):
         gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Haar Cascade ile yüz tespiti (basit yöntem)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        faces = get_cascade("frontalface").detectMultiScale(gray, 1.1, 4)
         
         # Sonuçları hazırla
         detected_faces = []
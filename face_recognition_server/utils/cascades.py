@@ -0,0 +1,74 @@
+"""
+Process-wide registry of Haar cascade classifiers and their detection parameters
+"""
+import logging
+import threading
+from typing import Any, Dict, Iterable, Tuple
+
+import cv2
+
+logger = logging.getLogger(__name__)
+
+CASCADE_FILES = {
+    "frontalface": "haarcascade_frontalface_default.xml",
+    "eye": "haarcascade_eye.xml",
+}
+
+# CascadeClassifier.detectMultiScale is not safe to call concurrently on one
+# instance, so every thread gets its own copy, parsed once per thread
+_local = threading.local()
+
+def _load(name: str) -> cv2.CascadeClassifier:
+    if name not in CASCADE_FILES:
+        raise ValueError(f"Unknown cascade: {name}")
+    cascade = cv2.CascadeClassifier(cv2.data.haarcascades + CASCADE_FILES[name])
+    if cascade.empty():
+        raise RuntimeError(f"Could not load cascade: {CASCADE_FILES[name]}")
+    logger.debug(f"Loaded {name} cascade in thread {threading.current_thread().name}")
+    return cascade
+
+def get_cascade(name: str) -> cv2.CascadeClassifier:
+    """
+    Get the calling thread's instance of a cascade, loading it on first use
+
+    Args:
+        name: Key of CASCADE_FILES (``frontalface`` or ``eye``)
+
+    Returns:
+        Loaded CascadeClassifier owned by the current thread
+    """
+    cascades: Dict[str, cv2.CascadeClassifier] = getattr(_local, "cascades", None)
+    if cascades is None:
+        cascades = _local.cascades = {}
+    cascade = cascades.get(name)
+    if cascade is None:
+        cascade = cascades[name] = _load(name)
+    return cascade
+
+def preload(names: Iterable[str] = tuple(CASCADE_FILES)):
+    """Load cascades in the calling thread, failing fast if an XML file is missing"""
+    for name in names:
+        get_cascade(name)
+
+# Smallest face searched for, as a fraction of the shorter image side
+MIN_FACE_FRACTION = 0.04
+
+def face_detection_params(shape: Tuple[int, ...]) -> Dict[str, Any]:
+    """
+    detectMultiScale parameters for the frontal-face cascade, sized to the image
+
+    Small images keep the fine 1.05 pyramid step so small faces are not
+    missed; larger images use a 1.1 step and skip faces below
+    MIN_FACE_FRACTION of the shorter side, which removes most pyramid levels.
+
+    Args:
+        shape: Shape of the image detection runs on
+
+    Returns:
+        Keyword arguments for detectMultiScale
+    """
+    min_side = min(shape[:2])
+    min_face = max(30, int(min_side * MIN_FACE_FRACTION))
+    if min_side <= 480:
+        return {'scaleFactor': 1.05, 'minNeighbors': 3, 'minSize': (min_face, min_face)}
+    return {'scaleFactor': 1.1, 'minNeighbors': 4, 'minSize': (min_face, min_face)}
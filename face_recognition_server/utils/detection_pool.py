@@ -0,0 +1,101 @@
+"""
+Bounded worker pool that runs Haar detection off the event loop
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from utils.cascades import preload
+
+logger = logging.getLogger(__name__)
+
+DETECTION_QUEUE_WAIT = Histogram(
+    'haar_detection_queue_wait_seconds',
+    'Time a request waited for a free detection worker'
+)
+
+DETECTION_LATENCY = Histogram(
+    'haar_detection_seconds',
+    'Time spent running detection on a worker thread'
+)
+
+DETECTION_QUEUE_DEPTH = Gauge(
+    'haar_detection_queue_depth',
+    'Requests waiting for a detection worker'
+)
+
+DETECTION_IN_FLIGHT = Gauge(
+    'haar_detection_in_flight',
+    'Detections currently running'
+)
+
+DETECTION_REJECTED = Counter(
+    'haar_detection_rejected_total',
+    'Requests rejected after waiting longer than the queue timeout'
+)
+
+class DetectionQueueTimeout(Exception):
+    """No detection worker became free within the queue timeout"""
+
+class DetectionPool:
+    """
+    Runs CPU-bound detection on a fixed set of threads
+
+    OpenCV releases the GIL inside detectMultiScale, so detections on
+    different workers run in parallel while the event loop keeps serving
+    other requests. Each worker loads its own cascades when it starts
+    (see utils.cascades). At most ``workers`` detections run at once;
+    later requests wait up to ``queue_timeout`` seconds for a slot.
+
+    Args:
+        workers: Worker threads, i.e. concurrent detections
+        queue_timeout: Seconds a request may wait for a worker
+        cascades: Cascades each worker preloads
+    """
+
+    def __init__(self, workers: int = 2, queue_timeout: float = 10.0,
+                 cascades: Iterable[str] = ("frontalface",)):
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="haar-detect",
+            initializer=preload,
+            initargs=(tuple(cascades),)
+        )
+        self._slots = asyncio.Semaphore(workers)
+
+    async def run(self, func: Callable, *args) -> Any:
+        """
+        Run ``func(*args)`` on a worker thread
+
+        Raises:
+            DetectionQueueTimeout: If no worker was free within the queue timeout
+        """
+        queued = time.perf_counter()
+        DETECTION_QUEUE_DEPTH.inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            DETECTION_REJECTED.inc()
+            raise DetectionQueueTimeout(
+                f"No detection worker free after {self.queue_timeout:.1f}s"
+            )
+        finally:
+            DETECTION_QUEUE_DEPTH.dec()
+        DETECTION_QUEUE_WAIT.observe(time.perf_counter() - queued)
+
+        try:
+            with DETECTION_IN_FLIGHT.track_inprogress(), DETECTION_LATENCY.time():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        """Wait for running detections and stop the workers"""
+        self._executor.shutdown(wait=True)
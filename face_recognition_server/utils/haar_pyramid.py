@@ -0,0 +1,176 @@
+"""
+Haar face and eye detection over one shared image pyramid
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.cascades import get_cascade
+
+logger = logging.getLogger(__name__)
+
+# Rectangle grouping tolerance used by detectMultiScale
+GROUP_EPS = 0.2
+
+# Share of a face box, from the top, that is searched for eyes
+EYE_REGION_FRACTION = 0.6
+
+FACE_DTYPE = np.dtype([
+    ('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32),
+    ('neighbors', np.int32), ('eyes', np.int32)
+])
+
+EYE_DTYPE = np.dtype([
+    ('face', np.int32),
+    ('x', np.int32), ('y', np.int32), ('w', np.int32), ('h', np.int32),
+    ('neighbors', np.int32)
+])
+
+def eye_search_bounds(x: int, y: int, w: int, h: int) -> Tuple[Tuple[int, int, int, int], int, int]:
+    """
+    Search region and size bounds for the eyes of one face box
+
+    Eyes sit in the upper half of a frontal face and are roughly a tenth to
+    a third of its width, so the search is limited to that band and size range.
+    The band reaches EYE_REGION_FRACTION of the box because Haar face boxes
+    often start at the brows, pushing the eyes just below the midline.
+
+    Args:
+        x, y, w, h: Face box in image pixels
+
+    Returns:
+        Tuple of ((x, y, w, h) region, min eye side, max eye side)
+    """
+    min_eye = max(5, w // 10)
+    max_eye = max(min_eye + 1, w // 3)
+    return (x, y, w, max(1, int(h * EYE_REGION_FRACTION))), min_eye, max_eye
+
+class HaarPyramid:
+    """
+    Grayscale image pyramid shared by every cascade run on one image
+
+    ``detectMultiScale`` rebuilds a pyramid (and the integral images of each
+    level) on every call, so the face pass and each per-face eye pass resize
+    the same pixels again. Here level ``k`` is the image scaled by
+    ``scale_factor ** -k``, built once, and each cascade is run at its
+    native window size on the levels that match the object sizes wanted.
+    Raw hits are mapped back to image pixels and grouped with
+    ``cv2.groupRectangles``, as detectMultiScale does internally.
+
+    Args:
+        gray: Grayscale image
+        scale_factor: Size ratio between consecutive levels
+        min_window: Smallest cascade window; levels below it are not built
+    """
+
+    def __init__(self, gray: np.ndarray, scale_factor: float = 1.1, min_window: int = 20):
+        self.gray = gray
+        self.scale_factor = scale_factor
+        self.levels: List[Tuple[float, np.ndarray]] = [(1.0, gray)]
+
+        height, width = gray.shape[:2]
+        scale = 1.0 / scale_factor
+        while min(height, width) * scale >= min_window:
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            self.levels.append((scale, cv2.resize(gray, size, interpolation=cv2.INTER_LINEAR)))
+            scale /= scale_factor
+
+    def detect(self, name: str, min_size: int, max_size: Optional[int] = None, min_neighbors: int = 3,
+               roi: Optional[Tuple[int, int, int, int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Run cascade ``name`` over the levels that cover the requested object sizes
+
+        Args:
+            name: Cascade registry key
+            min_size: Smallest object side in image pixels
+            max_size: Largest object side in image pixels (None for no limit)
+            min_neighbors: Raw hits a group needs to be kept
+            roi: Optional (x, y, w, h) search region in image pixels
+
+        Returns:
+            Tuple of (N x 4 int32 x/y/w/h array in image pixels, N group sizes)
+        """
+        cascade = get_cascade(name)
+        window_w, window_h = cascade.getOriginalWindowSize()
+        rx, ry, rw, rh = roi if roi is not None else (0, 0, self.gray.shape[1], self.gray.shape[0])
+
+        candidates = []
+        for scale, level in self.levels:
+            # An object of side s appears at side s * scale on this level
+            object_size = window_w / scale
+            if object_size < min_size:
+                continue
+            if max_size is not None and object_size > max_size:
+                break
+
+            x1, y1 = int(rx * scale), int(ry * scale)
+            x2 = min(level.shape[1], int(np.ceil((rx + rw) * scale)))
+            y2 = min(level.shape[0], int(np.ceil((ry + rh) * scale)))
+            if x2 - x1 < window_w or y2 - y1 < window_h:
+                break
+
+            # Single scale (min == max == window), raw hits (no grouping)
+            hits = cascade.detectMultiScale(level[y1:y2, x1:x2], scaleFactor=self.scale_factor,
+                                            minNeighbors=0, minSize=(window_w, window_h),
+                                            maxSize=(window_w, window_h))
+            for (x, y, w, h) in hits:
+                candidates.append([int(round((x + x1) / scale)), int(round((y + y1) / scale)),
+                                   int(round(w / scale)), int(round(h / scale))])
+
+        if not candidates:
+            return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.int32)
+        rects, weights = cv2.groupRectangles(candidates, min_neighbors, GROUP_EPS)
+        if len(rects) == 0:
+            return np.zeros((0, 4), dtype=np.int32), np.zeros(0, dtype=np.int32)
+        return np.asarray(rects, dtype=np.int32).reshape(-1, 4), np.asarray(weights, dtype=np.int32).reshape(-1)
+
+    def detect_eyes(self, face: Tuple[int, int, int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find eyes inside one face box, within the bounds of eye_search_bounds
+
+        Args:
+            face: (x, y, w, h) face box in image pixels
+
+        Returns:
+            Same as ``detect``
+        """
+        region, min_eye, max_eye = eye_search_bounds(*(int(v) for v in face))
+        return self.detect("eye", min_size=min_eye, max_size=max_eye, roi=region)
+
+def detect_faces_and_eyes(gray: np.ndarray, face_params: Dict[str, Any],
+                          detect_eyes: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Detect faces, then eyes inside each face, over one shared pyramid
+
+    Args:
+        gray: Grayscale image
+        face_params: detectMultiScale-style face parameters (``scaleFactor``,
+            ``minNeighbors``, ``minSize``), e.g. from face_detection_params
+        detect_eyes: Also search the upper part of each face for eyes
+
+    Returns:
+        Tuple of (faces as a FACE_DTYPE array, eyes as an EYE_DTYPE array
+        whose ``face`` field indexes into faces); eye counts are -1 when
+        ``detect_eyes`` is off
+    """
+    pyramid = HaarPyramid(gray, scale_factor=face_params.get('scaleFactor', 1.1))
+    rects, weights = pyramid.detect("frontalface", min_size=face_params.get('minSize', (30, 30))[0],
+                                    min_neighbors=face_params.get('minNeighbors', 3))
+
+    faces = np.zeros(len(rects), dtype=FACE_DTYPE)
+    for column, field in enumerate(('x', 'y', 'w', 'h')):
+        faces[field] = rects[:, column]
+    faces['neighbors'] = weights
+    faces['eyes'] = -1
+
+    eyes = []
+    if detect_eyes:
+        for i, face in enumerate(rects):
+            eye_rects, eye_weights = pyramid.detect_eyes(face)
+            faces['eyes'][i] = len(eye_rects)
+            for (ex, ey, ew, eh), weight in zip(eye_rects, eye_weights):
+                eyes.append((i, ex, ey, ew, eh, weight))
+
+    return faces, np.array(eyes, dtype=EYE_DTYPE)
@@ -0,0 +1,86 @@
+"""
+Reduced-resolution image decoding for detection-only paths
+"""
+import io
+import logging
+import os
+from typing import Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+# Same variable as the main app's DETECTION_MAX_SIDE setting
+DEFAULT_MAX_SIDE = int(os.environ.get("DETECTION_MAX_SIDE", 1280))
+
+REDUCED_GRAYSCALE = {1: cv2.IMREAD_GRAYSCALE, 2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+                     4: cv2.IMREAD_REDUCED_GRAYSCALE_4, 8: cv2.IMREAD_REDUCED_GRAYSCALE_8}
+REDUCED_COLOR = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                 4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+def read_image_size(source: Union[str, bytes]) -> Optional[Tuple[int, int]]:
+    """
+    Read (width, height) from the image header without decoding pixels
+
+    Args:
+        source: File path or encoded image bytes
+
+    Returns:
+        (width, height), or None if the header cannot be parsed
+    """
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            return image.size
+    except Exception:
+        return None
+
+def reduction_factor(size: Optional[Tuple[int, int]], max_side: int) -> int:
+    """Largest of 1/2/4/8 that keeps the longer side at or above ``max_side``"""
+    if size is None or max_side <= 0:
+        return 1
+    longest = max(size)
+    factor = 1
+    while factor < 8 and longest // (factor * 2) >= max_side:
+        factor *= 2
+    return factor
+
+def decode_for_detection(source: Union[str, bytes], max_side: int = DEFAULT_MAX_SIDE,
+                         color: bool = False) -> Tuple[Optional[np.ndarray], float]:
+    """
+    Decode an image at the resolution detection needs
+
+    JPEGs are decoded directly at 1/2, 1/4 or 1/8 scale in the DCT domain via
+    ``cv2.IMREAD_REDUCED_*``, so the full-size bitmap is never allocated; any
+    remaining excess is removed with an area resize. Other formats go through
+    the same flags, which OpenCV serves by decoding and then shrinking.
+
+    Args:
+        source: File path or encoded image bytes
+        max_side: Longest side of the returned image (0 keeps full resolution)
+        color: Decode BGR instead of grayscale
+
+    Returns:
+        Tuple of (image or None, scale), where scale is returned pixels per
+        original pixel; divide detected coordinates by it to map them back
+    """
+    size = read_image_size(source)
+    flags = (REDUCED_COLOR if color else REDUCED_GRAYSCALE)[reduction_factor(size, max_side)]
+
+    if isinstance(source, bytes):
+        image = cv2.imdecode(np.frombuffer(source, np.uint8), flags)
+    else:
+        image = cv2.imread(source, flags)
+    if image is None:
+        return None, 1.0
+
+    height, width = image.shape[:2]
+    if max_side > 0 and max(height, width) > max_side:
+        shrink = max_side / max(height, width)
+        image = cv2.resize(image, (max(1, round(width * shrink)), max(1, round(height * shrink))),
+                           interpolation=cv2.INTER_AREA)
+
+    # The decoder may apply EXIF rotation, so compare longer sides
+    original_longest = max(size) if size is not None else max(height, width)
+    return image, max(image.shape[:2]) / original_longest
@@ -11,7 +11,7 @@ from pathlib import Path
 # Face recognition server dizinini path'e ekle
 sys.path.append(str(Path(__file__).parent / "face_recognition_server"))
 
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import uvicorn
@@ -21,6 +21,11 @@ from PIL import Image
 import io
 import base64
 import json
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from utils.cascades import get_cascade, preload
+from utils.detection_pool import DetectionPool, DetectionQueueTimeout
+from utils.image_decode import decode_for_detection
 
 app = FastAPI(
     title="SendPic Face Recognition API",
@@ -28,6 +33,12 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Haar tespiti için sınırlı iş parçacığı havuzu (event loop'u bloklamaz)
+detection_pool = DetectionPool(
+    workers=int(os.environ.get("DETECTION_WORKERS", os.cpu_count() or 2)),
+    queue_timeout=float(os.environ.get("DETECTION_QUEUE_TIMEOUT", 10.0))
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -53,14 +64,13 @@ class HealthResponse(BaseModel):
 def detect_faces_simple(image_data):
     """Basit yüz tespiti"""
     try:
-        # OpenCV ile yüz tespiti
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        # OpenCV ile yüz tespiti (iş parçacığına özel, önbellekteki sınıflandırıcı)
+        face_cascade = get_cascade("frontalface")
         
-        # Görüntüyü yükle
-        nparr = np.frombuffer(image_data, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Görüntüyü tespit çözünürlüğünde, doğrudan gri tonlamalı çöz (JPEG için DCT ölçekleme)
+        gray, scale = decode_for_detection(image_data)
         
-        if image is None:
+        if gray is None:
             return FaceDetectionResult(
                 faces_detected=0,
                 face_locations=[],
@@ -69,9 +79,6 @@ def detect_faces_simple(image_data):
                 message="Görüntü yüklenemedi"
             )
         
-        # Gri tonlamaya çevir
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
         # Yüzleri tespit et
         faces = face_cascade.detectMultiScale(
             gray,
@@ -84,11 +91,12 @@ def detect_faces_simple(image_data):
         confidence_scores = []
         
         for (x, y, w, h) in faces:
+            # Koordinatları orijinal çözünürlüğe geri ölçekle
             face_locations.append({
-                "x": int(x),
-                "y": int(y),
-                "width": int(w),
-                "height": int(h)
+                "x": int(round(x / scale)),
+                "y": int(round(y / scale)),
+                "width": int(round(w / scale)),
+                "height": int(round(h / scale))
             })
             confidence_scores.append(0.8)  # Basit güven skoru
         
@@ -109,6 +117,16 @@ def detect_faces_simple(image_data):
             message=f"Hata: {str(e)}"
         )
 
+@app.on_event("startup")
+async def startup_event():
+    """Cascade XML dosyalarını istekten önce bir kez yükle"""
+    preload(["frontalface"])
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Çalışan tespitlerin bitmesini bekle"""
+    detection_pool.shutdown()
+
 @app.get("/", response_model=HealthResponse)
 async def root():
     """Ana endpoint"""
@@ -127,6 +145,11 @@ async def health_check():
         message="API sağlıklı"
     )
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrikleri"""
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/detect-faces", response_model=FaceDetectionResult)
 async def detect_faces(file: UploadFile = File(...)):
     """Yüz tespiti endpoint'i"""
@@ -138,11 +161,15 @@ async def detect_faces(file: UploadFile = File(...)):
         # Görüntü verisini oku
         image_data = await file.read()
         
-        # Yüz tespiti yap
-        result = detect_faces_simple(image_data)
+        # Yüz tespitini havuzdaki bir iş parçacığında yap
+        result = await detection_pool.run(detect_faces_simple, image_data)
         
         return result
         
+    except DetectionQueueTimeout as e:
+        raise HTTPException(status_code=503, detail=f"Sunucu meşgul: {str(e)}")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sunucu hatası: {str(e)}")
 
@@ -153,6 +180,8 @@ async def recognize_faces(file: UploadFile = File(...)):
         # Şimdilik sadece yüz tespiti yap
         return await detect_faces(file)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sunucu hatası: {str(e)}")
 
@@ -163,6 +192,8 @@ async def verify_identity(file: UploadFile = File(...)):
         # Şimdilik sadece yüz tespiti yap
         return await detect_faces(file)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Sunucu hatası: {str(e)}")
 
@@ -5,12 +5,15 @@ import cv2
 import numpy as np
 import torch
 import pickle
-from typing import List, Tuple, Optional, Dict, Any
+from typing import List, Tuple, Optional, Dict, Any, Hashable
 from pathlib import Path
 import face_recognition
 from facenet_pytorch import MTCNN, InceptionResnetV1
 from PIL import Image
 import logging
+from utils.metrics import GALLERY_SIZE
+from utils.cache import TTLCache
+from services.gallery import create_gallery
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -24,11 +27,43 @@ class FaceRecognitionService:
         self.device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
         self.face_detector = None
         self.face_encoder = None
-        self.known_embeddings = {}
-        self.known_face_ids = []
+        self.gallery = create_gallery(
+            settings.GALLERY_BACKEND,
+            search_effort=settings.PGVECTOR_SEARCH_EFFORT,
+            index_type=settings.PGVECTOR_INDEX,
+            max_per_user=settings.GALLERY_MAX_EMBEDDINGS_PER_USER,
+            coarse_k=settings.GALLERY_COARSE_K,
+            user_top_k=settings.GALLERY_USER_TOP_K
+        )
+        # Embeddings keyed by (image digest, crop box), shared across requests
+        self.embedding_cache = TTLCache(
+            'embedding',
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES,
+            ttl=settings.EMBEDDING_CACHE_TTL,
+            sizeof=lambda embedding: embedding.nbytes
+        ) if settings.EMBEDDING_CACHE_ENABLED else None
         self.load_models()
         self.load_known_faces()
     
+    @property
+    def gallery_version(self) -> Optional[Hashable]:
+        """
+        Current gallery version, which changes whenever enrolled faces change
+
+        Cached recognition results are keyed by this value. The database
+        backend derives it from the face_embeddings table, so faces added by
+        other processes also expire them.
+
+        Returns:
+            Version value, or None if it could not be read
+        """
+        try:
+            return self.gallery.version()
+        except Exception as e:
+            logger.error(f"Error reading gallery version: {e}")
+            return None
+    
     def load_models(self):
         """Load face detection and recognition models"""
         try:
@@ -96,46 +131,112 @@ class FaceRecognitionService:
             logger.error(f"Error detecting faces: {e}")
             return []
     
-    def extract_face_embedding(self, image: np.ndarray, bbox: List[float]) -> Optional[np.ndarray]:
+    def _preprocess_face(self, image: np.ndarray, bbox: List[float]) -> Optional[torch.Tensor]:
+        """
+        Crop and convert a face region into a FaceNet input tensor
+        
+        Args:
+            image: Input image
+            bbox: Bounding box coordinates [x1, y1, x2, y2]
+            
+        Returns:
+            Tensor of shape (3, 160, 160) or None
+        """
+        # Extract face region
+        x1, y1, x2, y2 = map(int, bbox)
+        face_crop = image[y1:y2, x1:x2]
+        
+        if face_crop.size == 0:
+            return None
+        
+        # Convert to PIL Image
+        face_pil = Image.fromarray(cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB))
+        
+        # Resize to 160x160 for FaceNet
+        face_pil = face_pil.resize((160, 160))
+        
+        # Convert to tensor
+        return torch.tensor(np.array(face_pil)).permute(2, 0, 1).float() / 255.0
+    
+    def extract_face_embedding(self, image: np.ndarray, bbox: List[float],
+                               image_key: Optional[str] = None) -> Optional[np.ndarray]:
         """
         Extract face embedding from detected face
         
         Args:
             image: Input image
             bbox: Bounding box coordinates [x1, y1, x2, y2]
+            image_key: Content digest of ``image``; when given, the embedding
+                is memoised and reused for the same image and crop
             
         Returns:
             Face embedding vector or None
         """
         try:
-            # Extract face region
-            x1, y1, x2, y2 = map(int, bbox)
-            face_crop = image[y1:y2, x1:x2]
-            
-            if face_crop.size == 0:
+            cache_key = None
+            if image_key is not None and self.embedding_cache is not None:
+                # The crop only depends on the integer box, see _preprocess_face
+                cache_key = (image_key, tuple(map(int, bbox)))
+                cached = self.embedding_cache.get(cache_key)
+                if cached is not None:
+                    return cached.copy()
+            
+            face_tensor = self._preprocess_face(image, bbox)
+            if face_tensor is None:
                 return None
             
-            # Convert to PIL Image
-            face_pil = Image.fromarray(cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB))
-            
-            # Resize to 160x160 for FaceNet
-            face_pil = face_pil.resize((160, 160))
-            
-            # Convert to tensor
-            face_tensor = torch.tensor(np.array(face_pil)).permute(2, 0, 1).float().unsqueeze(0) / 255.0
-            face_tensor = face_tensor.to(self.device)
+            face_tensor = face_tensor.unsqueeze(0).to(self.device)
             
             # Extract embedding
             with torch.no_grad():
                 embedding = self.face_encoder(face_tensor)
                 embedding = embedding.cpu().numpy().flatten()
             
+            if cache_key is not None:
+                self.embedding_cache.put(cache_key, embedding.copy())
+            
             return embedding
             
         except Exception as e:
             logger.error(f"Error extracting face embedding: {e}")
             return None
     
+    def extract_face_embeddings_batch(self, faces: List[Tuple[np.ndarray, List[float]]],
+                                      batch_size: int = 32) -> List[Optional[np.ndarray]]:
+        """
+        Extract embeddings for many faces with batched FaceNet inference
+        
+        Args:
+            faces: List of (image, bbox) pairs, possibly from different images
+            batch_size: Maximum number of faces per forward pass
+            
+        Returns:
+            Embeddings in input order, None where the crop was empty
+        """
+        embeddings: List[Optional[np.ndarray]] = [None] * len(faces)
+        
+        try:
+            tensors = []
+            indices = []
+            for i, (image, bbox) in enumerate(faces):
+                face_tensor = self._preprocess_face(image, bbox)
+                if face_tensor is not None:
+                    tensors.append(face_tensor)
+                    indices.append(i)
+            
+            for start in range(0, len(tensors), batch_size):
+                batch = torch.stack(tensors[start:start + batch_size]).to(self.device)
+                with torch.no_grad():
+                    batch_embeddings = self.face_encoder(batch).cpu().numpy()
+                for i, embedding in zip(indices[start:start + batch_size], batch_embeddings):
+                    embeddings[i] = embedding
+            
+            return embeddings
+            
+        except Exception as e:
+            logger.error(f"Error extracting face embeddings in batch: {e}")
+            return embeddings
+    
     def recognize_face(self, embedding: np.ndarray) -> Tuple[Optional[str], float]:
         """
         Recognize face from embedding
@@ -147,25 +248,17 @@ class FaceRecognitionService:
             Tuple of (user_id, confidence)
         """
         try:
-            if len(self.known_embeddings) == 0:
+            # Nearest known face
+            matches = self.gallery.search(embedding, k=1)
+            if not matches:
                 return None, 0.0
             
-            # Calculate distances to known faces
-            distances = []
-            for known_embedding in self.known_embeddings.values():
-                distance = np.linalg.norm(embedding - known_embedding)
-                distances.append(distance)
-            
-            # Find minimum distance
-            min_distance = min(distances)
+            user_id, min_distance = matches[0]
             
             # Convert distance to confidence (lower distance = higher confidence)
             confidence = max(0, 1 - min_distance / settings.FACE_RECOGNITION_THRESHOLD)
             
             if confidence > settings.FACE_RECOGNITION_THRESHOLD:
-                # Find the user_id with minimum distance
-                min_idx = distances.index(min_distance)
-                user_id = list(self.known_embeddings.keys())[min_idx]
                 return user_id, confidence
             
             return None, confidence
@@ -174,6 +267,51 @@ class FaceRecognitionService:
             logger.error(f"Error recognizing face: {e}")
             return None, 0.0
     
+    def verify_face(self, embedding: np.ndarray, user_id: str) -> Dict[str, Any]:
+        """
+        Verify a face against one claimed identity (1:1, no gallery scan)
+        
+        Args:
+            embedding: Face embedding vector
+            user_id: Claimed user identifier
+            
+        Returns:
+            Verification result with distance and confidence
+        """
+        try:
+            # Scored exactly as gallery search scores this user in recognize_face
+            distance = self.gallery.distance_to(user_id, embedding)
+            if distance is None:
+                return {
+                    'user_id': user_id,
+                    'verified': False,
+                    'enrolled': False,
+                    'distance': None,
+                    'confidence': 0.0
+                }
+            
+            # Same distance-to-confidence mapping as recognize_face
+            confidence = max(0, 1 - distance / settings.FACE_RECOGNITION_THRESHOLD)
+            
+            return {
+                'user_id': user_id,
+                'verified': confidence > settings.FACE_RECOGNITION_THRESHOLD,
+                'enrolled': True,
+                'distance': distance,
+                'confidence': confidence
+            }
+            
+        except Exception as e:
+            logger.error(f"Error verifying face: {e}")
+            return {
+                'user_id': user_id,
+                'verified': False,
+                'enrolled': False,
+                'distance': None,
+                'confidence': 0.0,
+                'error': str(e)
+            }
+    
     def add_face_to_database(self, user_id: str, embedding: np.ndarray, 
                            face_image_path: str, bbox: List[float], 
                            confidence: float) -> bool:
@@ -192,10 +330,15 @@ class FaceRecognitionService:
         """
         try:
             # Store embedding
-            self.known_embeddings[user_id] = embedding
-            self.known_face_ids.append(user_id)
+            self.gallery.add(
+                user_id,
+                embedding,
+                face_image_path=face_image_path,
+                bbox=bbox,
+                confidence=confidence
+            )
+            GALLERY_SIZE.set(len(self.gallery))
             
-            # TODO: Save to database
             logger.info(f"Face added to database for user: {user_id}")
             return True
             
@@ -269,9 +412,12 @@ class FaceRecognitionService:
             Statistics dictionary
         """
         return {
-            'total_known_faces': len(self.known_embeddings),
-            'known_user_ids': list(self.known_embeddings.keys()),
+            'total_known_faces': len(self.gallery),
+            'known_user_ids': self.gallery.user_ids(),
+            'total_known_embeddings': self.gallery.num_embeddings(),
+            'gallery_backend': settings.GALLERY_BACKEND,
             'model_device': str(self.device),
             'detection_threshold': settings.FACE_DETECTION_CONFIDENCE,
-            'recognition_threshold': settings.FACE_RECOGNITION_THRESHOLD
+            'recognition_threshold': settings.FACE_RECOGNITION_THRESHOLD,
+            'embedding_cache': self.embedding_cache.stats() if self.embedding_cache is not None else None
         }
@@ -0,0 +1,327 @@
+"""
+Gallery backends holding enrolled face embeddings for recognition
+"""
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Float, func, select, text
+
+from database.models import FaceEmbedding, FaceGalleryState, uses_pgvector
+
+logger = logging.getLogger(__name__)
+
+class InMemoryGallery:
+    """
+    Process-local gallery with several embeddings per user
+
+    Exemplars are packed into one contiguous matrix ordered by user, with
+    ``offsets`` marking each user's rows, and every user has an
+    L2-normalised centroid. Search shortlists the ``coarse_k`` users whose
+    centroids are closest to the query, then scores only their exemplars,
+    so the scan cost follows the number of users rather than photos.
+
+    Args:
+        max_per_user: Exemplars kept per user; the oldest are dropped first
+        coarse_k: Users shortlisted by centroid (0 scores every user)
+        user_top_k: Nearest exemplar distances averaged into a user's score
+    """
+
+    def __init__(self, max_per_user: int = 10, coarse_k: int = 32, user_top_k: int = 1):
+        self.max_per_user = max_per_user
+        self.coarse_k = coarse_k
+        self.user_top_k = user_top_k
+        self.exemplars: Dict[str, List[np.ndarray]] = {}
+
+        self._version = 0
+        self._dirty = False
+        self._user_ids: List[str] = []
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._matrix: Optional[np.ndarray] = None
+        self._sq_norms: Optional[np.ndarray] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def add(self, user_id: str, embedding: np.ndarray, **details):
+        """Add an exemplar for ``user_id``"""
+        with self._lock:
+            rows = self.exemplars.setdefault(user_id, [])
+            rows.append(np.asarray(embedding, dtype=np.float32).reshape(-1))
+            del rows[:-self.max_per_user]
+            self._version += 1
+            self._dirty = True
+
+    def version(self) -> int:
+        """Counter bumped on every change to this process's gallery"""
+        return self._version
+
+    def search(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """
+        Find the nearest enrolled users
+
+        Returns:
+            Up to ``k`` (user_id, L2 distance) pairs, nearest first; the
+            distance is the mean of the user's ``user_top_k`` nearest exemplars
+        """
+        with self._lock:
+            if not self.exemplars:
+                return []
+            if self._dirty:
+                self._rebuild()
+            user_ids, offsets = self._user_ids, self._offsets
+            matrix, sq_norms, centroids = self._matrix, self._sq_norms, self._centroids
+
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+
+        # Coarse pass: rank users by cosine similarity to their centroid
+        shortlist_size = max(self.coarse_k, k)
+        if self.coarse_k and len(user_ids) > shortlist_size:
+            norm = np.linalg.norm(query)
+            similarities = centroids @ (query / norm if norm > 0 else query)
+            shortlist = np.argpartition(-similarities, shortlist_size - 1)[:shortlist_size]
+        else:
+            shortlist = None
+
+        # Fine pass: exact distances to the shortlisted users' exemplars only
+        # ||x - q||^2 = ||x||^2 - 2 x.q + ||q||^2 avoids materialising x - q
+        if shortlist is None:
+            shortlist = np.arange(len(user_ids))
+            squared = sq_norms - 2 * (matrix @ query)
+        else:
+            rows = np.concatenate([np.arange(offsets[u], offsets[u + 1]) for u in shortlist])
+            squared = sq_norms[rows] - 2 * (matrix[rows] @ query)
+        distances = np.sqrt(np.maximum(squared + float(query @ query), 0.0))
+
+        counts = offsets[shortlist + 1] - offsets[shortlist]
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        if self.user_top_k == 1:
+            user_scores = np.minimum.reduceat(distances, starts)
+        else:
+            user_scores = np.empty(len(shortlist), dtype=np.float64)
+            for i, (start, count) in enumerate(zip(starts, counts)):
+                user_scores[i] = user_distance(distances[start:start + count], self.user_top_k)
+
+        top = np.argsort(user_scores)[:k]
+        return [(user_ids[shortlist[i]], float(user_scores[i])) for i in top]
+
+    def embeddings_for(self, user_id: str) -> Optional[np.ndarray]:
+        """Exemplars of one user as a (n, dim) matrix, or None if not enrolled"""
+        rows = self.exemplars.get(user_id)
+        return np.stack(rows) if rows else None
+
+    def distance_to(self, user_id: str, embedding: np.ndarray) -> Optional[float]:
+        """
+        Score one user the way ``search`` does, or None if not enrolled
+
+        Uses the same ``user_top_k`` averaging, so 1:1 verification and 1:N
+        recognition agree on a user's distance.
+        """
+        exemplars = self.embeddings_for(user_id)
+        if exemplars is None:
+            return None
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        return user_distance(np.linalg.norm(exemplars - query, axis=1), self.user_top_k)
+
+    def user_ids(self) -> List[str]:
+        return list(self.exemplars)
+
+    def num_embeddings(self) -> int:
+        return sum(len(rows) for rows in self.exemplars.values())
+
+    def __len__(self) -> int:
+        return len(self.exemplars)
+
+    def _rebuild(self):
+        self._user_ids = list(self.exemplars)
+        counts = [len(self.exemplars[user_id]) for user_id in self._user_ids]
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._matrix = np.ascontiguousarray(
+            np.stack([row for user_id in self._user_ids for row in self.exemplars[user_id]])
+        )
+        self._sq_norms = np.einsum('ij,ij->i', self._matrix, self._matrix)
+        sums = np.add.reduceat(self._matrix, self._offsets[:-1], axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        self._centroids = sums / norms
+        self._dirty = False
+
+class DatabaseGallery:
+    """
+    Gallery stored in the face_embeddings table and shared by all API nodes
+
+    On PostgreSQL with pgvector, ``search`` is a top-k ``<->`` (L2) query
+    served by the HNSW/IVFFlat index, so nothing is held in process memory.
+    Other databases (SQLite for local runs and tests) fall back to loading
+    the stored float32 bytes and searching them with numpy.
+
+    Args:
+        session_factory: Callable returning a new synchronous session
+        search_effort: hnsw.ef_search / ivfflat.probes for each query
+            (0 keeps the server default)
+        index_type: pgvector index type the effort applies to
+        max_per_user: Expected exemplars per user, used to over-fetch
+    """
+
+    def __init__(self, session_factory: Callable, search_effort: int = 0, index_type: str = "hnsw",
+                 max_per_user: int = 10):
+        self.session_factory = session_factory
+        self.max_per_user = max_per_user
+        self.search_effort = search_effort
+        self.index_type = index_type
+
+    def add(self, user_id: str, embedding: np.ndarray, face_image_path: Optional[str] = None,
+            bbox: Optional[List[float]] = None, confidence: float = 0.0):
+        """Insert one embedding row for ``user_id``"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self.session_factory() as db:
+            db.execute(FaceEmbedding.__table__.insert(), [{
+                'user_id': user_id,
+                'embedding': vector.tobytes(),
+                'embedding_vector': vector,
+                'face_image_path': face_image_path,
+                'face_bbox': json.dumps(bbox) if bbox is not None else None,
+                'confidence': confidence
+            }])
+            db.commit()
+
+    def version(self) -> Tuple[int, int]:
+        """
+        Gallery version read from the database, cheap enough for every request
+
+        Rows inserted by any process (other API workers and nodes, or
+        utils.bulk_enroll) raise ``max(id)``, an index lookup; deletes and
+        embedding updates bump the face_gallery_state counter through
+        triggers. Rows are never counted.
+
+        Returns:
+            Tuple of (highest row id, change counter)
+        """
+        with self.session_factory() as db:
+            max_id, changes = db.execute(select(
+                select(func.max(FaceEmbedding.id)).scalar_subquery(),
+                select(FaceGalleryState.changes).where(FaceGalleryState.id == 1).scalar_subquery()
+            )).one()
+        if changes is None:
+            raise RuntimeError("face_gallery_state is not initialised; run init_database()")
+        return max_id or 0, changes
+
+    def search(self, embedding: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """
+        Find the nearest enrolled embeddings
+
+        Returns:
+            Up to ``k`` (user_id, L2 distance) pairs, nearest first
+        """
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        with self.session_factory() as db:
+            if uses_pgvector(db.get_bind().dialect):
+                return self._search_pgvector(db, query, k)
+            return self._search_rows(db, query, k)
+
+    def _search_pgvector(self, db, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        if self.search_effort > 0:
+            # SET LOCAL only lasts for this transaction
+            setting = "hnsw.ef_search" if self.index_type == "hnsw" else "ivfflat.probes"
+            db.execute(text(f"SET LOCAL {setting} = {int(self.search_effort)}"))
+
+        # Users can have several rows; over-fetch and keep each user's nearest
+        distance = FaceEmbedding.embedding_vector.op('<->', return_type=Float)(query)
+        rows = db.execute(
+            select(FaceEmbedding.user_id, distance.label('distance'))
+            .where(FaceEmbedding.embedding_vector.isnot(None))
+            .order_by(distance)
+            .limit(k * self.max_per_user)
+        ).all()
+        return _nearest_per_user([(row.user_id, float(row.distance)) for row in rows], k)
+
+    def _search_rows(self, db, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        rows = db.execute(select(FaceEmbedding.user_id, FaceEmbedding.embedding)).all()
+        rows = [row for row in rows if len(row.embedding) == query.nbytes]
+        if not rows:
+            return []
+
+        matrix = np.frombuffer(b"".join(row.embedding for row in rows), dtype=np.float32).reshape(len(rows), -1)
+        distances = np.linalg.norm(matrix - query, axis=1)
+        order = np.argsort(distances)
+        return _nearest_per_user([(rows[i].user_id, float(distances[i])) for i in order], k)
+
+    def embeddings_for(self, user_id: str) -> Optional[np.ndarray]:
+        """Exemplars of one user as a (n, dim) matrix, or None if not enrolled"""
+        with self.session_factory() as db:
+            blobs = list(db.execute(
+                select(FaceEmbedding.embedding).where(FaceEmbedding.user_id == user_id)
+            ).scalars())
+        if not blobs:
+            return None
+        return np.stack([np.frombuffer(blob, dtype=np.float32) for blob in blobs])
+
+    def distance_to(self, user_id: str, embedding: np.ndarray) -> Optional[float]:
+        """
+        Score one user the way ``search`` does (nearest row), or None if not enrolled
+        """
+        exemplars = self.embeddings_for(user_id)
+        if exemplars is None:
+            return None
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        return user_distance(np.linalg.norm(exemplars - query, axis=1), 1)
+
+    def user_ids(self) -> List[str]:
+        with self.session_factory() as db:
+            return list(db.execute(select(FaceEmbedding.user_id).distinct()).scalars())
+
+    def num_embeddings(self) -> int:
+        with self.session_factory() as db:
+            return db.execute(select(func.count()).select_from(FaceEmbedding)).scalar() or 0
+
+    def __len__(self) -> int:
+        with self.session_factory() as db:
+            return db.execute(select(func.count(func.distinct(FaceEmbedding.user_id)))).scalar() or 0
+
+def user_distance(distances: np.ndarray, top_k: int = 1) -> float:
+    """
+    A user's score from the distances to their exemplars
+
+    Args:
+        distances: L2 distance from the query to each of the user's exemplars
+        top_k: Nearest distances averaged (1 = nearest exemplar)
+
+    Returns:
+        Mean of the ``top_k`` smallest distances
+    """
+    n = max(1, min(top_k, len(distances)))
+    return float(np.partition(distances, n - 1)[:n].mean())
+
+def _nearest_per_user(matches: List[Tuple[str, float]], k: int) -> List[Tuple[str, float]]:
+    """Keep the first (nearest) match of each user from distance-sorted matches"""
+    seen = set()
+    unique = []
+    for user_id, distance in matches:
+        if user_id not in seen:
+            seen.add(user_id)
+            unique.append((user_id, distance))
+            if len(unique) == k:
+                break
+    return unique
+
+def create_gallery(backend: str, search_effort: int = 0, index_type: str = "hnsw",
+                   max_per_user: int = 10, coarse_k: int = 32, user_top_k: int = 1):
+    """
+    Build the gallery backend named by GALLERY_BACKEND
+
+    Args:
+        backend: ``memory`` or ``database``
+        search_effort: Per-query ANN search effort for the database backend
+        index_type: pgvector index type (hnsw, ivfflat, none)
+        max_per_user: Exemplars kept (memory) or expected (database) per user
+        coarse_k: Users shortlisted by centroid in the memory backend
+        user_top_k: Exemplar distances averaged per user in the memory backend
+    """
+    if backend == "memory":
+        return InMemoryGallery(max_per_user=max_per_user, coarse_k=coarse_k, user_top_k=user_top_k)
+    if backend == "database":
+        from database.connection import SessionLocal
+        return DatabaseGallery(SessionLocal, search_effort=search_effort, index_type=index_type,
+                               max_per_user=max_per_user)
+    raise ValueError(f"Unknown gallery backend: {backend}")
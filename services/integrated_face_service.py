@@ -12,6 +12,12 @@ from services.face_recognition_service import FaceRecognitionService
 from services.gender_detection_service import GenderDetectionService
 from services.anti_spoof_service import AntiSpoofService
 from services.yolo_service import YOLOService
+from services.result_cache import ResultCache
+from services.pipeline_plan import PipelinePlan, PipelineStages, StageCostEstimator
+from utils.metrics import StageTimer, FACES_DETECTED, FACES_RECOGNIZED, STAGES_SKIPPED, STAGE_SECONDS_SAVED
+from utils.cache import image_digest
+from utils.image_scaling import downscale_for_detection, rescale_detections
+from utils.profiling import PipelineProfiler
 from config import settings
 
 logger = logging.getLogger(__name__)
@@ -26,71 +32,161 @@ class IntegratedFaceService:
         self.gender_detection = GenderDetectionService()
         self.anti_spoof = AntiSpoofService()
         self.yolo = YOLOService()
+        self.profiler = PipelineProfiler(settings.PROFILE_DIR)
+        self.result_cache = ResultCache(
+            max_entries=settings.RESULT_CACHE_MAX_ENTRIES,
+            max_bytes=settings.RESULT_CACHE_MAX_BYTES,
+            ttl=settings.RESULT_CACHE_TTL,
+            phash_distance=settings.RESULT_CACHE_PHASH_DISTANCE
+        ) if settings.RESULT_CACHE_ENABLED else None
+        self.stage_costs = StageCostEstimator()
         
         logger.info("Integrated Face Service initialized")
     
-    def process_image_comprehensive(self, image_path: str) -> Dict[str, Any]:
+    def resolve_stages(self, plan: PipelinePlan = PipelinePlan.FULL,
+                       enable_anti_spoof: Optional[bool] = None,
+                       enable_gender_detection: Optional[bool] = None) -> PipelineStages:
+        """
+        Work out which per-face stages a request runs
+        
+        Per-request flags can only switch off stages the server has enabled.
+        
+        Args:
+            plan: Pipeline plan
+            enable_anti_spoof: Per-request anti-spoofing flag (None = server default)
+            enable_gender_detection: Per-request gender detection flag (None = server default)
+            
+        Returns:
+            Resolved stages
+        """
+        plan = PipelinePlan(plan)
+        full = plan == PipelinePlan.FULL
+        return PipelineStages(
+            plan=plan.value,
+            embed=plan != PipelinePlan.DETECT,
+            gender=full and settings.ENABLE_GENDER_DETECTION and enable_gender_detection is not False,
+            anti_spoof=full and settings.ENABLE_ANTI_SPOOF and enable_anti_spoof is not False
+        )
+    
+    def process_image_comprehensive(self, image_path: str,
+                                    image: Optional[np.ndarray] = None,
+                                    stages: Optional[PipelineStages] = None) -> Dict[str, Any]:
         """
         Comprehensive image processing with all services
         
         Args:
             image_path: Path to input image
+            image: Already decoded image; ``image_path`` is only reported then
+            stages: Stages to run (see resolve_stages); defaults to the full plan
             
         Returns:
             Comprehensive analysis results
         """
+        stages = stages or self.resolve_stages()
+        # Plain attribute check keeps the disabled path free of profiling overhead
+        if self.profiler.armed:
+            return self.profiler.run(self._process_image_comprehensive, image_path, image, stages)
+        return self._process_image_comprehensive(image_path, image, stages)
+    
+    def _process_image_comprehensive(self, image_path: str, image: Optional[np.ndarray],
+                                     stages: PipelineStages) -> Dict[str, Any]:
+        """Run the planned pipeline; see process_image_comprehensive"""
         start_time = time.time()
+        timer = StageTimer()
+        skipped_stages = stages.skipped()
         
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-            
-            # Initialize results
-            results = {
-                'image_path': image_path,
-                'processing_time': 0,
-                'faces_detected': 0,
-                'faces_analyzed': [],
-                'overall_risk_score': 0,
-                'success': True,
-                'error': None
-            }
-            
-            # Step 1: Face Detection (using both MTCNN and YOLO)
-            logger.info("Detecting faces...")
-            mtcnn_faces = self.face_recognition.detect_faces(image)
-            yolo_faces = self.yolo.detect_faces_yolo(image)
-            
-            # Combine face detections
-            all_faces = self._combine_face_detections(mtcnn_faces, yolo_faces)
-            results['faces_detected'] = len(all_faces)
-            
-            if len(all_faces) == 0:
-                results['processing_time'] = time.time() - start_time
-                return results
-            
-            # Step 2: Analyze each detected face
-            faces_analyzed = []
-            risk_scores = []
-            
-            for i, face in enumerate(all_faces):
-                logger.info(f"Analyzing face {i+1}/{len(all_faces)}")
+            with timer.stage('total'):
+                # Load image
+                if image is None:
+                    with timer.stage('decode'):
+                        image = cv2.imread(image_path)
+                if image is None:
+                    raise ValueError(f"Could not load image: {image_path}")
                 
-                face_analysis = self._analyze_single_face(image, face, i)
-                faces_analyzed.append(face_analysis)
+                # Content digest keys both the result and the embedding caches
+                with timer.stage('cache_lookup'):
+                    image_key = image_digest(image)
+                    # Read once: a result is stored under the version it was looked up with,
+                    # and an unreadable version bypasses the result cache
+                    gallery_version = self.face_recognition.gallery_version \
+                        if self.result_cache is not None else None
+                    cached = self.result_cache.lookup(
+                        image_key, image, gallery_version, stages
+                    ) if gallery_version is not None else None
                 
-                # Collect risk scores
-                if face_analysis.get('anti_spoof', {}).get('is_spoof', False):
-                    risk_scores.append(face_analysis['anti_spoof']['risk_score'])
-            
-            results['faces_analyzed'] = faces_analyzed
-            results['overall_risk_score'] = max(risk_scores) if risk_scores else 0
+                # Re-uploads of an already analysed image are served from the cache
+                if cached is not None:
+                    cached.update({
+                        'image_path': image_path,
+                        'processing_time': time.time() - start_time,
+                        'stage_timings': timer.timings,
+                        'cache_hit': True
+                    })
+                    return cached
+                
+                # Initialize results
+                results = {
+                    'image_path': image_path,
+                    'image_digest': image_key,
+                    'processing_time': 0,
+                    'faces_detected': 0,
+                    'faces_analyzed': [],
+                    'overall_risk_score': 0,
+                    'stage_timings': timer.timings,
+                    'plan': stages.plan,
+                    'skipped_stages': skipped_stages,
+                    'estimated_savings': {},
+                    'cache_hit': False,
+                    'success': True,
+                    'error': None
+                }
+                
+                # Step 1: Face Detection (using both MTCNN and YOLO)
+                logger.info("Detecting faces...")
+                with timer.stage('detection'):
+                    all_faces = self.detect_faces(image, timer)
+                results['faces_detected'] = len(all_faces)
+                
+                # Step 2: Analyze each detected face
+                faces_analyzed = []
+                risk_scores = []
+                
+                with timer.stage('analysis'):
+                    for i, face in enumerate(all_faces):
+                        logger.info(f"Analyzing face {i+1}/{len(all_faces)}")
+                        
+                        face_analysis = self._analyze_single_face(image, face, i, timer, image_key, stages)
+                        faces_analyzed.append(face_analysis)
+                        
+                        # Collect risk scores
+                        if face_analysis.get('anti_spoof', {}).get('is_spoof', False):
+                            risk_scores.append(face_analysis['anti_spoof']['risk_score'])
+                
+                results['faces_analyzed'] = faces_analyzed
+                results['overall_risk_score'] = max(risk_scores) if risk_scores else 0
             
             # Step 3: Calculate processing time
             results['processing_time'] = time.time() - start_time
             
+            # Learn what each stage costs per face, and report what skipping saved
+            faces = len(faces_analyzed)
+            self.stage_costs.observe(
+                timer.timings, ['facenet', 'gallery_search', 'gender', 'anti_spoof'], faces
+            )
+            results['estimated_savings'] = self.stage_costs.estimate(skipped_stages, faces)
+            for stage in skipped_stages:
+                STAGES_SKIPPED.labels(stage=stage).inc()
+            for stage, seconds in results['estimated_savings'].items():
+                STAGE_SECONDS_SAVED.labels(stage=stage).inc(seconds)
+            
+            if gallery_version is not None:
+                self.result_cache.store(
+                    image_key, image, gallery_version,
+                    {key: value for key, value in results.items() if key != 'stage_timings'},
+                    stages
+                )
+            
             logger.info(f"Comprehensive analysis completed in {results['processing_time']:.2f}s")
             return results
             
@@ -98,14 +194,154 @@ class IntegratedFaceService:
             logger.error(f"Error in comprehensive image processing: {e}")
             return {
                 'image_path': image_path,
+                'image_digest': None,
                 'processing_time': time.time() - start_time,
                 'faces_detected': 0,
                 'faces_analyzed': [],
                 'overall_risk_score': 1.0,
+                'stage_timings': timer.timings,
+                'plan': stages.plan,
+                'skipped_stages': skipped_stages,
+                'estimated_savings': {},
+                'cache_hit': False,
                 'success': False,
                 'error': str(e)
             }
     
+    def verify_identity(self, image_path: str, user_id: str, check_anti_spoof: bool = False,
+                        check_gender: bool = False) -> Dict[str, Any]:
+        """
+        Verify that the most confident face in an image belongs to ``user_id``
+        
+        Only MTCNN, FaceNet and a lookup of the claimed user's embeddings run;
+        YOLO and the gallery scan are skipped, and anti-spoofing and gender
+        detection only run when requested.
+        
+        Args:
+            image_path: Path to input image
+            user_id: Claimed user identifier
+            check_anti_spoof: Also run anti-spoofing on the face
+            check_gender: Also run gender detection on the face
+            
+        Returns:
+            Verification results
+        """
+        start_time = time.time()
+        timer = StageTimer()
+        
+        try:
+            with timer.stage('total'):
+                with timer.stage('decode'):
+                    image = cv2.imread(image_path)
+                if image is None:
+                    raise ValueError(f"Could not load image: {image_path}")
+                
+                with timer.stage('detection'):
+                    small, scale = downscale_for_detection(image, settings.DETECTION_MAX_SIDE)
+                    with timer.model('mtcnn'):
+                        faces = rescale_detections(self.face_recognition.detect_faces(small), scale)
+                if not faces:
+                    raise ValueError("No faces detected in image")
+                
+                best_face = max(faces, key=lambda face: face['confidence'])
+                
+                with timer.stage('verification'):
+                    with timer.model('facenet'):
+                        embedding = self.face_recognition.extract_face_embedding(
+                            image, best_face['bbox'], image_digest(image)
+                        )
+                    if embedding is None:
+                        raise ValueError("Could not extract face embedding")
+                    with timer.model('gallery_lookup'):
+                        verification = self.face_recognition.verify_face(embedding, user_id)
+                
+                results = {
+                    'user_id': user_id,
+                    'verified': verification['verified'],
+                    'enrolled': verification['enrolled'],
+                    'distance': verification['distance'],
+                    'confidence': verification['confidence'],
+                    'bbox': best_face['bbox'],
+                    'detection_confidence': best_face['confidence'],
+                    'faces_detected': len(faces),
+                    'anti_spoof': None,
+                    'gender_detection': None,
+                    'processing_time': 0,
+                    'stage_timings': timer.timings,
+                    'success': True,
+                    'error': None
+                }
+                
+                if check_anti_spoof or check_gender:
+                    face_region = self.yolo.extract_face_from_bbox(image, best_face['bbox'])
+                    if face_region is None:
+                        raise ValueError("Could not extract face region")
+                    
+                    if check_anti_spoof:
+                        with timer.model('anti_spoof'):
+                            results['anti_spoof'] = self.anti_spoof.comprehensive_spoof_detection(face_region)
+                        # A spoofed face never verifies
+                        if results['anti_spoof'].get('is_spoof', False):
+                            results['verified'] = False
+                    
+                    if check_gender:
+                        with timer.model('gender'):
+                            results['gender_detection'] = self.gender_detection.predict_gender_advanced(face_region)
+            
+            results['processing_time'] = time.time() - start_time
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error verifying identity: {e}")
+            return {
+                'user_id': user_id,
+                'verified': False,
+                'enrolled': False,
+                'distance': None,
+                'confidence': 0.0,
+                'bbox': None,
+                'detection_confidence': 0.0,
+                'faces_detected': 0,
+                'anti_spoof': None,
+                'gender_detection': None,
+                'processing_time': time.time() - start_time,
+                'stage_timings': timer.timings,
+                'success': False,
+                'error': str(e)
+            }
+    
+    def detect_faces(self, image: np.ndarray, timer: Optional[StageTimer] = None) -> List[Dict[str, Any]]:
+        """
+        Detect faces with MTCNN and YOLO and merge the detections
+        
+        Detectors run on a copy whose longer side is at most
+        DETECTION_MAX_SIDE; boxes and landmarks are mapped back to the
+        original resolution, so crops still use the full-resolution pixels.
+        
+        Args:
+            image: Input image
+            timer: Optional per-request stage timer
+            
+        Returns:
+            Combined face detections
+        """
+        timer = timer or StageTimer()
+        
+        small, scale = downscale_for_detection(image, settings.DETECTION_MAX_SIDE)
+        
+        with timer.model('mtcnn'):
+            mtcnn_faces = self.face_recognition.detect_faces(small)
+        with timer.model('yolo'):
+            yolo_faces = self.yolo.detect_faces_yolo(small)
+        
+        rescale_detections(mtcnn_faces, scale)
+        rescale_detections(yolo_faces, scale)
+        faces = self._combine_face_detections(mtcnn_faces, yolo_faces)
+        for face in faces:
+            FACES_DETECTED.labels(method=face['detection_method']).inc()
+        
+        return faces
+    
     def _combine_face_detections(self, mtcnn_faces: List[Dict], yolo_faces: List[Dict]) -> List[Dict]:
         """
         Combine face detections from different models
@@ -182,7 +418,10 @@ class IntegratedFaceService:
             logger.error(f"Error calculating IoU: {e}")
             return False
     
-    def _analyze_single_face(self, image: np.ndarray, face: Dict[str, Any], face_id: int) -> Dict[str, Any]:
+    def _analyze_single_face(self, image: np.ndarray, face: Dict[str, Any], face_id: int,
+                             timer: Optional[StageTimer] = None,
+                             image_key: Optional[str] = None,
+                             stages: Optional[PipelineStages] = None) -> Dict[str, Any]:
         """
         Analyze a single detected face
         
@@ -190,10 +429,16 @@ class IntegratedFaceService:
             image: Input image
             face: Face detection data
             face_id: Face identifier
+            timer: Optional per-request stage timer
+            image_key: Content digest of ``image`` for the embedding cache
+            stages: Stages to run; defaults to the full plan
             
         Returns:
             Comprehensive face analysis
         """
+        timer = timer or StageTimer()
+        stages = stages or self.resolve_stages()
+        
         try:
             bbox = face['bbox']
             
@@ -213,14 +458,26 @@ class IntegratedFaceService:
                 'bbox': bbox,
                 'detection_confidence': face['confidence'],
                 'detection_method': face.get('detection_method', 'unknown'),
+                'stage_timings': {},
                 'success': True
             }
+            # Model time spent on this face alone; the request timer sums over faces
+            face_timings = analysis['stage_timings']
             
             # Face Recognition
-            logger.info(f"Performing face recognition for face {face_id}")
-            embedding = self.face_recognition.extract_face_embedding(image, bbox)
+            embedding = None
+            if stages.embed:
+                logger.info(f"Performing face recognition for face {face_id}")
+                started = time.perf_counter()
+                with timer.model('facenet'):
+                    embedding = self.face_recognition.extract_face_embedding(image, bbox, image_key)
+                face_timings['facenet'] = time.perf_counter() - started
             if embedding is not None:
-                user_id, rec_confidence = self.face_recognition.recognize_face(embedding)
+                started = time.perf_counter()
+                with timer.model('gallery_search'):
+                    user_id, rec_confidence = self.face_recognition.recognize_face(embedding)
+                face_timings['gallery_search'] = time.perf_counter() - started
+                FACES_RECOGNIZED.labels(result='known' if user_id is not None else 'unknown').inc()
                 analysis['face_recognition'] = {
                     'user_id': user_id,
                     'confidence': rec_confidence,
@@ -232,26 +489,34 @@ class IntegratedFaceService:
                     'user_id': None,
                     'confidence': 0.0,
                     'is_known': False,
-                    'embedding_available': False
+                    'embedding_available': False,
+                    'skipped': not stages.embed
                 }
             
             # Gender Detection
-            if settings.ENABLE_GENDER_DETECTION:
+            if stages.gender:
                 logger.info(f"Performing gender detection for face {face_id}")
-                gender_result = self.gender_detection.predict_gender_advanced(face_region)
+                started = time.perf_counter()
+                with timer.model('gender'):
+                    gender_result = self.gender_detection.predict_gender_advanced(face_region)
+                face_timings['gender'] = time.perf_counter() - started
                 analysis['gender_detection'] = gender_result
             else:
                 analysis['gender_detection'] = {
                     'gender': 'unknown',
                     'confidence': 0.0,
                     'is_confident': False,
-                    'age_estimate': None
+                    'age_estimate': None,
+                    'skipped': True
                 }
             
             # Anti-Spoofing Detection
-            if settings.ENABLE_ANTI_SPOOF:
+            if stages.anti_spoof:
                 logger.info(f"Performing anti-spoof detection for face {face_id}")
-                spoof_result = self.anti_spoof.comprehensive_spoof_detection(face_region)
+                started = time.perf_counter()
+                with timer.model('anti_spoof'):
+                    spoof_result = self.anti_spoof.comprehensive_spoof_detection(face_region)
+                face_timings['anti_spoof'] = time.perf_counter() - started
                 analysis['anti_spoof'] = spoof_result
             else:
                 analysis['anti_spoof'] = {
@@ -259,7 +524,8 @@ class IntegratedFaceService:
                     'confidence': 0.0,
                     'spoof_type': 'real',
                     'risk_score': 0.0,
-                    'is_high_risk': False
+                    'is_high_risk': False,
+                    'skipped': True
                 }
             
             # Calculate overall confidence
@@ -327,8 +593,13 @@ class IntegratedFaceService:
             Addition result
         """
         try:
+            # Decode once; analysis and enrollment share the image
+            image = cv2.imread(image_path)
+            if image is None:
+                raise ValueError(f"Could not load image: {image_path}")
+            
             # Process image
-            results = self.process_image_comprehensive(image_path)
+            results = self.process_image_comprehensive(image_path, image)
             
             if not results['success'] or results['faces_detected'] == 0:
                 return {
@@ -350,10 +621,11 @@ class IntegratedFaceService:
                     'spoof_type': best_face['anti_spoof']['spoof_type']
                 }
             
-            # Extract embedding
+            # Extract embedding (reuses the one computed during analysis)
             embedding = self.face_recognition.extract_face_embedding(
-                cv2.imread(image_path), 
-                best_face['bbox']
+                image,
+                best_face['bbox'],
+                image_key=results['image_digest']
             )
             
             if embedding is None:
@@ -399,6 +671,8 @@ class IntegratedFaceService:
             'gender_detection': self.gender_detection.get_gender_statistics(),
             'anti_spoof': self.anti_spoof.get_anti_spoof_statistics(),
             'yolo': self.yolo.get_yolo_statistics(),
+            'result_cache': self.result_cache.stats() if self.result_cache is not None else None,
+            'stage_costs': dict(self.stage_costs.costs),
             'settings': {
                 'face_detection_threshold': settings.FACE_DETECTION_CONFIDENCE,
                 'face_recognition_threshold': settings.FACE_RECOGNITION_THRESHOLD,
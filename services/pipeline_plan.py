@@ -0,0 +1,64 @@
+"""
+Per-request pipeline plans and stage cost estimates
+"""
+import threading
+from enum import Enum
+from typing import Dict, List, NamedTuple
+
+class PipelinePlan(str, Enum):
+    """How much of the pipeline a request needs"""
+    DETECT = "detect"  # bounding boxes only
+    EMBED = "embed"    # + FaceNet embedding and gallery search
+    FULL = "full"      # + gender detection and anti-spoofing
+
+class PipelineStages(NamedTuple):
+    """Resolved per-face stages for one request (hashable, used in cache keys)"""
+    plan: str
+    embed: bool
+    gender: bool
+    anti_spoof: bool
+
+    def skipped(self) -> List[str]:
+        """Model stages that will not run"""
+        skipped = []
+        if not self.embed:
+            skipped += ['facenet', 'gallery_search']
+        if not self.gender:
+            skipped.append('gender')
+        if not self.anti_spoof:
+            skipped.append('anti_spoof')
+        return skipped
+
+class StageCostEstimator:
+    """
+    Exponentially weighted per-face cost of each model stage
+
+    Fed from the stage timings of requests that ran a stage, and used to
+    estimate what skipping it saved on requests that did not.
+
+    Args:
+        alpha: Weight of the newest observation
+    """
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.costs: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, timings: Dict[str, float], stages: List[str], faces: int):
+        """Update the per-face cost of ``stages`` from one request's timings"""
+        if faces <= 0:
+            return
+        with self._lock:
+            for stage in stages:
+                if stage not in timings:
+                    continue
+                per_face = timings[stage] / faces
+                previous = self.costs.get(stage)
+                self.costs[stage] = per_face if previous is None else \
+                    previous + self.alpha * (per_face - previous)
+
+    def estimate(self, stages: List[str], faces: int) -> Dict[str, float]:
+        """Estimated seconds ``stages`` would have cost for ``faces`` faces"""
+        with self._lock:
+            return {stage: self.costs[stage] * faces for stage in stages if stage in self.costs}
@@ -0,0 +1,79 @@
+"""
+Content-addressed cache for comprehensive image analysis results
+"""
+import copy
+import pickle
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+from utils.cache import TTLCache, perceptual_hash, hamming_distance
+from utils.metrics import CACHE_REQUESTS
+
+class ResultCache:
+    """
+    Caches ``process_image_comprehensive`` results by decoded image content
+
+    Keys combine a digest of the decoded pixels, the request options and the
+    gallery version, so re-uploads of the same picture hit regardless of file
+    name or container, and any gallery change makes older entries unreachable
+    (they then age out through LRU/TTL). With ``phash_distance`` > 0, images
+    of the same size whose perceptual hashes differ by at most that many bits
+    are treated as the same picture.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: float, phash_distance: int = 0):
+        self.phash_distance = phash_distance
+        self.cache = TTLCache(
+            'result',
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl=ttl,
+            sizeof=lambda entry: len(pickle.dumps(entry['result']))
+        )
+
+    def lookup(self, digest: str, image: np.ndarray, gallery_version: Hashable,
+               options: Hashable = ()) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result for ``image``
+
+        Args:
+            digest: ``image_digest`` of the decoded image
+            image: Decoded image, used for near-duplicate matching
+            gallery_version: Current gallery version
+            options: Hashable request options that change the result
+
+        Returns:
+            Copy of the cached result or None
+        """
+        entry = self.cache.get((digest, options, gallery_version))
+
+        if entry is None and self.phash_distance > 0:
+            phash = perceptual_hash(image)
+            for (_, entry_options, entry_version), candidate in self.cache.items():
+                if (entry_options == options and entry_version == gallery_version
+                        and candidate['shape'] == image.shape
+                        and hamming_distance(candidate['phash'], phash) <= self.phash_distance):
+                    entry = candidate
+                    CACHE_REQUESTS.labels(cache=self.cache.name, result='near_hit').inc()
+                    break
+
+        if entry is None:
+            return None
+        return copy.deepcopy(entry['result'])
+
+    def store(self, digest: str, image: np.ndarray, gallery_version: Hashable,
+              result: Dict[str, Any], options: Hashable = ()):
+        """Cache a successful result"""
+        self.cache.put((digest, options, gallery_version), {
+            'result': copy.deepcopy(result),
+            'shape': image.shape,
+            'phash': perceptual_hash(image) if self.phash_distance > 0 else None
+        })
+
+    def invalidate(self):
+        """Drop every cached result"""
+        self.cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.cache.stats(), 'phash_distance': self.phash_distance}
@@ -0,0 +1,42 @@
+-- Pick a random content recipient in the database instead of shipping every user id to the API
+--
+-- Seeks the primary key index to the first id at or after a random pivot
+-- (wrapping around to the first id if the pivot lands after the last one), so
+-- a pick costs O(log N) with no table scan and no extra column.
+--
+-- The pick is not uniform: each user is chosen with probability proportional
+-- to the gap between its id and the previous one. users.id comes from
+-- auth.users and is a random (v4) UUID, so the gaps are roughly exponential
+-- and the luckiest of N users is picked about ln N times as often as average.
+-- That is acceptable for spreading content around; callers that need a fair
+-- draw must not rely on this function.
+--
+-- Only the API (service_role) may call it directly; see the grants at the end.
+CREATE OR REPLACE FUNCTION public.pick_random_recipient(sender UUID)
+RETURNS UUID AS $$
+DECLARE
+  pivot UUID := gen_random_uuid();
+  picked UUID;
+BEGIN
+  SELECT id INTO picked
+  FROM public.users
+  WHERE id >= pivot AND id <> sender
+  ORDER BY id
+  LIMIT 1;
+
+  IF picked IS NULL THEN
+    SELECT id INTO picked
+    FROM public.users
+    WHERE id <> sender
+    ORDER BY id
+    LIMIT 1;
+  END IF;
+
+  RETURN picked;
+END;
+$$ LANGUAGE plpgsql VOLATILE SECURITY DEFINER SET search_path = public;
+
+-- Functions are executable by PUBLIC by default, and Supabase also grants
+-- anon and authenticated explicitly
+REVOKE ALL ON FUNCTION public.pick_random_recipient(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.pick_random_recipient(UUID) TO service_role;
@@ -0,0 +1,66 @@
+-- Send content to a random recipient in one transaction
+--
+-- Replaces the API's read tokens -> pick recipient -> insert post ->
+-- insert recipient -> update tokens sequence (five round trips, and two
+-- concurrent sends could both spend the same token). The token check and
+-- decrement is a single conditional UPDATE, so the row lock serialises
+-- concurrent sends by the same user and a balance can never go negative.
+--
+-- Errors use PostgREST's PTxxx SQLSTATEs, which become the HTTP status.
+--
+-- sender is trusted as given, so only the API may call this: it runs as
+-- service_role and passes the caller's user id. See the grants at the end.
+CREATE OR REPLACE FUNCTION public.send_content(
+  sender UUID,
+  content_type TEXT,
+  content_url TEXT,
+  caption TEXT DEFAULT NULL
+)
+RETURNS JSONB AS $$
+DECLARE
+  recipient UUID;
+  new_post UUID;
+  remaining INTEGER;
+BEGIN
+  IF content_type NOT IN ('photo', 'video') THEN
+    RAISE EXCEPTION 'Invalid content type' USING ERRCODE = 'PT400';
+  END IF;
+
+  recipient := public.pick_random_recipient(sender);
+  IF recipient IS NULL THEN
+    RAISE EXCEPTION 'No recipients available' USING ERRCODE = 'PT400';
+  END IF;
+
+  UPDATE public.user_tokens
+  SET photo_tokens = photo_tokens - CASE WHEN content_type = 'photo' THEN 1 ELSE 0 END,
+      video_tokens = video_tokens - CASE WHEN content_type = 'video' THEN 1 ELSE 0 END,
+      updated_at = NOW()
+  WHERE user_id = sender
+    AND CASE WHEN content_type = 'photo' THEN photo_tokens ELSE video_tokens END > 0
+  RETURNING CASE WHEN content_type = 'photo' THEN photo_tokens ELSE video_tokens END
+  INTO remaining;
+
+  IF NOT FOUND THEN
+    IF NOT EXISTS (SELECT 1 FROM public.user_tokens WHERE user_id = sender) THEN
+      RAISE EXCEPTION 'User tokens not found' USING ERRCODE = 'PT404';
+    END IF;
+    RAISE EXCEPTION 'Insufficient % tokens', content_type USING ERRCODE = 'PT400';
+  END IF;
+
+  INSERT INTO public.posts (user_id, content_type, content_url, caption, is_public)
+  VALUES (sender, content_type, content_url, caption, true)
+  RETURNING id INTO new_post;
+
+  INSERT INTO public.content_recipients (content_id, sender_id, recipient_id, tokens_used)
+  VALUES (new_post, sender, recipient, 1);
+
+  RETURN jsonb_build_object(
+    'content_id', new_post,
+    'recipient_id', recipient,
+    'remaining_tokens', remaining
+  );
+END;
+$$ LANGUAGE plpgsql VOLATILE SECURITY DEFINER SET search_path = public;
+
+REVOKE ALL ON FUNCTION public.send_content(UUID, TEXT, TEXT, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.send_content(UUID, TEXT, TEXT, TEXT) TO service_role;
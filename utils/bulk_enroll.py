@@ -0,0 +1,283 @@
+"""
+Offline bulk enrollment of face embeddings
+
+Walks a directory (``<root>/<user_id>/*.jpg`` or ``<root>/<user_id>.jpg``) or a
+manifest (CSV with ``user_id,image_path`` columns, or JSON lines with the same
+keys), decodes images in a process pool, batches the detected faces through
+FaceNet and bulk-inserts ``FaceEmbedding`` rows. Workers shrink each image to
+DETECTION_MAX_SIDE before handing it back, so only the detection-size copy
+crosses the process boundary; detection, anti-spoofing and embedding all run
+on that copy, and stored boxes are mapped back to original pixels. Progress is appended to a
+checkpoint file so an interrupted run can be resumed.
+
+Only the ``face_embeddings`` table is written. The API recognises these faces
+when it runs with ``GALLERY_BACKEND=database``; the default in-memory gallery
+does not load from the database, so with ``GALLERY_BACKEND=memory`` enrolled
+faces are not recognised.
+
+Usage:
+    python -m utils.bulk_enroll photos/ --workers 8 --batch-size 64
+    python -m utils.bulk_enroll manifest.csv --checkpoint enroll.ckpt
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import cv2
+import numpy as np
+
+from config import settings
+from database.connection import SessionLocal, init_database
+from database.models import FaceEmbedding
+from utils.image_scaling import downscale_for_detection
+
+logger = logging.getLogger(__name__)
+
+STATUS_OK = "ok"
+STATUS_NO_FACE = "no_face"
+STATUS_SPOOF = "spoof"
+STATUS_DECODE_ERROR = "decode_error"
+STATUS_EMBEDDING_ERROR = "embedding_error"
+
+def iter_directory(root: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (user_id, image_path) pairs from a directory tree
+
+    Images inside a sub-directory belong to the user named after that
+    sub-directory; images directly under the root use their file stem.
+    """
+    extensions = {ext.lower() for ext in settings.ALLOWED_EXTENSIONS}
+    for path in sorted(root.rglob("*")):
+        if not path.is_file() or path.suffix.lower() not in extensions:
+            continue
+        relative = path.relative_to(root)
+        user_id = relative.parts[0] if len(relative.parts) > 1 else path.stem
+        yield user_id, str(path)
+
+def iter_manifest(manifest: Path) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (user_id, image_path) pairs from a CSV or JSON-lines manifest
+
+    Relative image paths are resolved against the manifest's directory.
+    """
+    base_dir = manifest.parent
+
+    def resolve(image_path: str) -> str:
+        path = Path(image_path)
+        return str(path if path.is_absolute() else base_dir / path)
+
+    with open(manifest, "r", newline="") as f:
+        if manifest.suffix.lower() in (".jsonl", ".json"):
+            for line in f:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    yield str(entry["user_id"]), resolve(entry["image_path"])
+        else:
+            for row in csv.DictReader(f):
+                yield str(row["user_id"]), resolve(row["image_path"])
+
+def load_checkpoint(checkpoint: Path, retry_failed: bool = False) -> Set[str]:
+    """
+    Load the set of image paths that were already processed
+
+    Args:
+        checkpoint: Checkpoint file path
+        retry_failed: Only treat successfully enrolled images as done
+
+    Returns:
+        Set of image paths to skip
+    """
+    done = set()
+    if not checkpoint.exists():
+        return done
+
+    with open(checkpoint, "r") as f:
+        for line in f:
+            image_path, _, status = line.rstrip("\n").rpartition("\t")
+            if image_path and (status == STATUS_OK or not retry_failed):
+                done.add(image_path)
+
+    return done
+
+def _decode_image(image_path: str) -> Tuple[str, Optional[np.ndarray], float]:
+    """
+    Decode an image in a worker process, shrunk to detection size
+
+    Returns:
+        Tuple of (image path, detection-size image or None, scale), where
+        scale is returned pixels per original pixel
+    """
+    image = cv2.imread(image_path)
+    if image is None:
+        return image_path, None, 1.0
+    small, scale = downscale_for_detection(image, settings.DETECTION_MAX_SIDE)
+    return image_path, small, scale
+
+def _chunks(items: List[Tuple[str, str]], size: int) -> Iterator[List[Tuple[str, str]]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def enroll(
+    items: List[Tuple[str, str]],
+    checkpoint: Path,
+    workers: int,
+    batch_size: int,
+    chunk_size: int,
+    skip_anti_spoof: bool = False
+) -> Dict[str, int]:
+    """
+    Enroll all (user_id, image_path) items
+
+    Images are decoded one chunk ahead of the chunk being analysed, so
+    decoding overlaps with detection and embedding.
+
+    Returns:
+        Counts per outcome status
+    """
+    # Imported here so decode workers do not pull in the model stack
+    from services.integrated_face_service import IntegratedFaceService
+
+    service = IntegratedFaceService()
+    counts = {status: 0 for status in (
+        STATUS_OK, STATUS_NO_FACE, STATUS_SPOOF, STATUS_DECODE_ERROR, STATUS_EMBEDDING_ERROR
+    )}
+
+    chunks = list(_chunks(items, chunk_size))
+    if not chunks:
+        return counts
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, open(checkpoint, "a") as ckpt:
+        def submit(chunk):
+            return [executor.submit(_decode_image, image_path) for _, image_path in chunk]
+
+        pending = submit(chunks[0])
+        for index, chunk in enumerate(chunks):
+            futures = pending
+            if index + 1 < len(chunks):
+                pending = submit(chunks[index + 1])
+
+            statuses: Dict[str, str] = {}
+            candidates = []
+            for (user_id, _), future in zip(chunk, futures):
+                image_path, image, scale = future.result()
+                if image is None:
+                    statuses[image_path] = STATUS_DECODE_ERROR
+                    continue
+
+                faces = service.detect_faces(image)
+                if not faces:
+                    statuses[image_path] = STATUS_NO_FACE
+                    continue
+
+                best_face = max(faces, key=lambda face: face['confidence'])
+
+                if not skip_anti_spoof:
+                    face_region = service.yolo.extract_face_from_bbox(image, best_face['bbox'])
+                    if face_region is None or service.anti_spoof.comprehensive_spoof_detection(face_region)['is_spoof']:
+                        statuses[image_path] = STATUS_SPOOF
+                        continue
+
+                candidates.append((user_id, image_path, image, scale, best_face))
+
+            embeddings = service.face_recognition.extract_face_embeddings_batch(
+                [(image, face['bbox']) for _, _, image, _, face in candidates],
+                batch_size=batch_size
+            )
+
+            rows = []
+            for (user_id, image_path, _, scale, face), embedding in zip(candidates, embeddings):
+                if embedding is None:
+                    statuses[image_path] = STATUS_EMBEDDING_ERROR
+                    continue
+                rows.append({
+                    'user_id': user_id,
+                    'embedding': embedding.astype(np.float32).tobytes(),
+                    'embedding_vector': embedding,
+                    'face_image_path': image_path,
+                    'face_bbox': json.dumps([float(v) / scale for v in face['bbox']]),
+                    'confidence': face['confidence']
+                })
+                statuses[image_path] = STATUS_OK
+
+            if rows:
+                db = SessionLocal()
+                try:
+                    db.execute(FaceEmbedding.__table__.insert(), rows)
+                    db.commit()
+                finally:
+                    db.close()
+
+            # Only checkpoint once the rows are committed
+            for image_path, status in statuses.items():
+                ckpt.write(f"{image_path}\t{status}\n")
+                counts[status] += 1
+            ckpt.flush()
+
+            logger.info(f"Chunk {index + 1}/{len(chunks)}: {len(rows)} faces enrolled")
+
+    return counts
+
+GALLERY_NOTE = (
+    "Embeddings are written to the face_embeddings table only. The API recognises them "
+    "with GALLERY_BACKEND=database; the default in-memory gallery (GALLERY_BACKEND=memory) "
+    "does not load from the database, so faces enrolled here are not recognised there."
+)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk enroll face embeddings from a directory or manifest",
+        epilog=GALLERY_NOTE
+    )
+    parser.add_argument("source", help="Image directory or manifest file (.csv / .jsonl)")
+    parser.add_argument("--checkpoint", default="bulk_enroll.checkpoint", help="Checkpoint file used for resuming")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Decode worker processes")
+    parser.add_argument("--batch-size", type=int, default=32, help="Faces per FaceNet forward pass")
+    parser.add_argument("--chunk-size", type=int, default=128, help="Images per decode/insert chunk")
+    parser.add_argument("--skip-anti-spoof", action="store_true", help="Do not reject spoofed faces")
+    parser.add_argument("--retry-failed", action="store_true", help="Reprocess images that failed previously")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+    source = Path(args.source)
+    checkpoint = Path(args.checkpoint)
+    all_items = list(iter_directory(source) if source.is_dir() else iter_manifest(source))
+    done = load_checkpoint(checkpoint, retry_failed=args.retry_failed)
+    items = [item for item in all_items if item[1] not in done]
+
+    logger.info(f"{len(all_items)} images found, {len(all_items) - len(items)} already processed")
+    if settings.GALLERY_BACKEND != "database":
+        logger.warning(GALLERY_NOTE)
+    init_database()
+
+    start_time = time.time()
+    counts = enroll(
+        items,
+        checkpoint=checkpoint,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        skip_anti_spoof=args.skip_anti_spoof
+    )
+    elapsed = time.time() - start_time
+
+    processed = sum(counts.values())
+    print("Bulk enrollment report")
+    print(f"  images processed : {processed}")
+    for status, count in counts.items():
+        print(f"  {status:<17}: {count}")
+    print(f"  elapsed          : {elapsed:.2f}s")
+    print(f"  throughput       : {processed / elapsed if elapsed > 0 else 0.0:.2f} images/sec")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+In-process LRU cache with TTL and size bounds, plus image hashing helpers
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.metrics import CACHE_REQUESTS, CACHE_ENTRIES
+
+class TTLCache:
+    """
+    Thread-safe LRU cache bounded by entry count, approximate bytes and age
+
+    Args:
+        name: Cache name used as the metrics label
+        max_entries: Maximum number of entries
+        max_bytes: Maximum summed ``sizeof`` of the cached values
+        ttl: Seconds an entry stays valid (0 disables expiry)
+        sizeof: Function estimating the size of a value in bytes
+    """
+
+    def __init__(self, name: str, max_entries: int, max_bytes: int, ttl: float,
+                 sizeof: Callable[[Any], int] = lambda value: 0):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if absent or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[0] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_REQUESTS.labels(cache=self.name, result='miss').inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.labels(cache=self.name, result='hit').inc()
+            return entry[2]
+
+    def put(self, key: Hashable, value: Any):
+        """Insert or refresh an entry, evicting least recently used ones"""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic(), size, value)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+            CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+    def pop(self, key: Hashable):
+        """Remove an entry if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                CACHE_ENTRIES.labels(cache=self.name).set(len(self._entries))
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            CACHE_ENTRIES.labels(cache=self.name).set(0)
+
+    def items(self):
+        """Snapshot of (key, value) pairs, oldest first"""
+        with self._lock:
+            return [(key, entry[2]) for key, entry in self._entries.items()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+def image_digest(image: np.ndarray) -> str:
+    """Content hash of decoded pixels (independent of file encoding)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((image.shape, image.dtype.str)).encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()
+
+def perceptual_hash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash (dHash); near-duplicate images differ in few bits
+    """
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
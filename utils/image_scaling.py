@@ -0,0 +1,47 @@
+"""
+Detection-resolution helpers for large uploads
+"""
+from typing import Any, Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+def downscale_for_detection(image: np.ndarray, max_side: int) -> Tuple[np.ndarray, float]:
+    """
+    Shrink an image so its longer side is at most ``max_side``
+
+    Args:
+        image: Input image
+        max_side: Longest side for detection (0 disables downscaling)
+
+    Returns:
+        Tuple of (detection image, scale), where scale is detection pixels
+        per original pixel (1.0 when the image is already small enough)
+    """
+    height, width = image.shape[:2]
+    longest = max(height, width)
+    if max_side <= 0 or longest <= max_side:
+        return image, 1.0
+
+    scale = max_side / longest
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA), scale
+
+def rescale_detections(faces: List[Dict[str, Any]], scale: float) -> List[Dict[str, Any]]:
+    """
+    Map boxes and landmarks found at ``scale`` back to original pixels (in place)
+
+    Args:
+        faces: Detections with 'bbox' and optional 'landmarks'
+        scale: Scale returned by downscale_for_detection
+
+    Returns:
+        The same detections
+    """
+    if scale == 1.0:
+        return faces
+    for face in faces:
+        face['bbox'] = [float(v) / scale for v in face['bbox']]
+        if face.get('landmarks') is not None:
+            face['landmarks'] = [[float(x) / scale, float(y) / scale] for x, y in face['landmarks']]
+    return faces
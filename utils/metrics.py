@@ -0,0 +1,130 @@
+"""
+Prometheus metrics for the face analysis pipeline
+"""
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest
+
+# Pipeline stages (decode, detection, analysis, total)
+STAGE_LATENCY = Histogram(
+    'face_pipeline_stage_seconds',
+    'Latency of face pipeline stages',
+    ['stage']
+)
+
+# Individual model calls (mtcnn, yolo, facenet, gallery_search, gender, anti_spoof)
+MODEL_LATENCY = Histogram(
+    'face_model_inference_seconds',
+    'Latency of individual model invocations',
+    ['model']
+)
+
+REQUESTS_TOTAL = Counter(
+    'face_api_requests_total',
+    'HTTP requests handled by the face API',
+    ['method', 'path', 'status']
+)
+
+FACES_DETECTED = Counter(
+    'face_faces_detected_total',
+    'Faces detected, by winning detector',
+    ['method']
+)
+
+FACES_RECOGNIZED = Counter(
+    'face_faces_recognized_total',
+    'Faces matched against the gallery, by outcome',
+    ['result']
+)
+
+QUEUE_DEPTH = Gauge(
+    'face_pipeline_queue_depth',
+    'Image requests waiting for or running in the pipeline'
+)
+
+GALLERY_SIZE = Gauge(
+    'face_gallery_size',
+    'Number of enrolled identities in the in-memory gallery'
+)
+
+STAGES_SKIPPED = Counter(
+    'face_pipeline_stages_skipped_total',
+    'Requests that skipped a model stage because of their pipeline plan',
+    ['stage']
+)
+
+STAGE_SECONDS_SAVED = Counter(
+    'face_pipeline_stage_seconds_saved_total',
+    'Estimated model time saved by skipped stages',
+    ['stage']
+)
+
+CACHE_REQUESTS = Counter(
+    'face_cache_requests_total',
+    'Cache lookups, by cache and outcome',
+    ['cache', 'result']
+)
+
+CACHE_ENTRIES = Gauge(
+    'face_cache_entries',
+    'Entries currently held, by cache',
+    ['cache']
+)
+
+LOG_SINK_FLUSH_LATENCY = Histogram(
+    'face_log_sink_flush_seconds',
+    'Latency of bulk log writes'
+)
+
+LOG_SINK_RECORDS = Counter(
+    'face_log_sink_records_total',
+    'Log records handled by the write-behind sink, by table and outcome',
+    ['table', 'result']
+)
+
+LOG_SINK_QUEUE_DEPTH = Gauge(
+    'face_log_sink_queue_depth',
+    'Log records waiting to be written'
+)
+
+class StageTimer:
+    """
+    Collects stage and model durations for a single request
+
+    Every measurement is observed on the matching histogram and summed into
+    ``timings`` so it can be returned alongside the request result.
+    """
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    def _record(self, name: str, elapsed: float):
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a pipeline stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_LATENCY.labels(stage=name).observe(elapsed)
+            self._record(name, elapsed)
+
+    @contextmanager
+    def model(self, name: str):
+        """Time a single model invocation"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            MODEL_LATENCY.labels(model=name).observe(elapsed)
+            self._record(name, elapsed)
+
+def render_metrics() -> bytes:
+    """Render all registered metrics in the Prometheus text format"""
+    return generate_latest()
@@ -0,0 +1,186 @@
+"""
+On-demand profiling of the inference pipeline
+
+The profiler is armed for the next N requests through the admin API. While
+disarmed, callers only read the ``armed`` attribute, so normal requests pay
+nothing beyond a single attribute check.
+"""
+import cProfile
+import logging
+import pstats
+import threading
+import time
+import zipfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_MODES = ("cprofile", "torch")
+
+class PipelineProfiler:
+    """
+    Captures cProfile statistics or torch.profiler Chrome traces for a
+    bounded number of requests and writes them to a downloadable artifact
+    """
+
+    def __init__(self, output_dir: str):
+        self.output_dir = Path(output_dir)
+        self.armed = False
+        self.mode = "cprofile"
+        self.requested = 0
+        self.captured = 0
+        self.last_artifact: Optional[Path] = None
+        self._remaining = 0
+        self._stats: Optional[pstats.Stats] = None
+        self._traces: List[Path] = []
+        self._lock = threading.Lock()
+        # cProfile and torch.profiler cannot run concurrently in one process
+        self._run_lock = threading.Lock()
+
+    def arm(self, requests: int, mode: str = "cprofile") -> Dict[str, Any]:
+        """
+        Profile the next ``requests`` pipeline runs
+
+        Args:
+            requests: Number of requests to capture
+            mode: ``cprofile`` (pstats file) or ``torch`` (zip of Chrome traces)
+
+        Returns:
+            Profiler status
+        """
+        if mode not in SUPPORTED_MODES:
+            raise ValueError(f"Unsupported profiling mode: {mode}")
+        if requests < 1:
+            raise ValueError("requests must be at least 1")
+        if mode == "torch":
+            import torch.profiler  # noqa: F401 - fail early if torch is unavailable
+
+        with self._lock:
+            self.mode = mode
+            self.requested = requests
+            self.captured = 0
+            self._remaining = requests
+            self._stats = None
+            self._traces = []
+            self.armed = True
+
+        logger.info(f"Profiler armed for {requests} requests ({mode})")
+        return self.status()
+
+    def disarm(self) -> Dict[str, Any]:
+        """Stop profiling, writing whatever has been captured so far"""
+        with self._lock:
+            if self.armed:
+                self._remaining = 0
+                self._finalize()
+        return self.status()
+
+    def status(self) -> Dict[str, Any]:
+        """Current profiler state"""
+        return {
+            'armed': self.armed,
+            'mode': self.mode,
+            'requested': self.requested,
+            'captured': self.captured,
+            'artifact': str(self.last_artifact) if self.last_artifact else None
+        }
+
+    def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call ``func`` under the profiler if a capture slot is left
+
+        Args:
+            func: Function to run
+            *args, **kwargs: Passed through to ``func``
+
+        Returns:
+            Whatever ``func`` returns
+        """
+        with self._lock:
+            capture = self._remaining > 0
+            if capture:
+                self._remaining -= 1
+            mode = self.mode
+
+        if not capture:
+            return func(*args, **kwargs)
+
+        with self._run_lock:
+            if mode == "torch":
+                return self._run_torch(func, *args, **kwargs)
+            return self._run_cprofile(func, *args, **kwargs)
+
+    def _run_cprofile(self, func: Callable, *args, **kwargs) -> Any:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            with self._lock:
+                # A capture that outlives disarm() belongs to no artifact
+                if self.armed:
+                    if self._stats is None:
+                        self._stats = pstats.Stats(profiler)
+                    else:
+                        self._stats.add(profiler)
+                    self._capture_done()
+
+    def _run_torch(self, func: Callable, *args, **kwargs) -> Any:
+        import torch
+        from torch.profiler import profile, ProfilerActivity
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        prof = None
+        try:
+            with profile(activities=activities, record_shapes=True) as prof:
+                return func(*args, **kwargs)
+        finally:
+            # prof stays None if the profiler failed to start; that error propagates
+            trace_path = None
+            with self._lock:
+                armed = self.armed
+            if prof is not None and armed:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                trace_path = self.output_dir / f"trace_{int(time.time() * 1000)}.json"
+                prof.export_chrome_trace(str(trace_path))
+            with self._lock:
+                # A capture that outlives disarm() belongs to no artifact
+                if self.armed:
+                    if trace_path is not None:
+                        self._traces.append(trace_path)
+                    self._capture_done()
+                elif trace_path is not None:
+                    trace_path.unlink()
+
+    def _capture_done(self):
+        """Account for a finished capture; caller holds ``_lock``"""
+        self.captured += 1
+        if self.captured >= self.requested:
+            self._finalize()
+
+    def _finalize(self):
+        """Write the artifact and disarm; caller holds ``_lock``"""
+        self.armed = False
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+
+        if self.mode == "cprofile" and self._stats is not None:
+            artifact = self.output_dir / f"profile_{timestamp}.pstats"
+            self._stats.dump_stats(str(artifact))
+            self.last_artifact = artifact
+        elif self.mode == "torch" and self._traces:
+            artifact = self.output_dir / f"profile_{timestamp}.zip"
+            with zipfile.ZipFile(artifact, "w", zipfile.ZIP_DEFLATED) as archive:
+                for trace in self._traces:
+                    archive.write(trace, trace.name)
+                    trace.unlink()
+            self.last_artifact = artifact
+        else:
+            return
+
+        logger.info(f"Profile written to {self.last_artifact} ({self.captured} requests)")